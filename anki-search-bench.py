@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+# anki-search-bench.py
+
+"""
+Benchmarks for anki-search.py.
+
+Each benchmark is a sub-command:
+
+    trigram   Compares trigram index lookups in the local mirror with a linear scan
+              (and, optionally, with findCards through the bundled fake AnkiConnect
+              server holding the same notes) on synthetic collections of several sizes.
+    e2e       Runs anki-search.py end to end against the bundled fake AnkiConnect
+              server (anki-search-fake-server.py) and reports p50/p95 latency,
+              throughput and peak RSS of --query, --browse-query and --query-file
+              at several collection sizes.
+    render    Times the output formatters (plain, html, json, ndjson) against the
+              previous print-per-field renderer, and compares the memory of Card
+              records with per-card dictionaries.
+    strip     Measures the throughput (MB/s) of HTML field cleaning: the previous
+              per-field regex function, the field cleaner per field, in one pass
+              per batch, and spread over a process pool.
+    startup   Measures the cold-start import time of each mode with -X importtime
+              and exits with status 1 if a mode exceeds its budget or imports a
+              module it should not need (e.g. requests for --browse-query).
+
+Run './anki-search-bench.py <benchmark> --help' for the options of each benchmark.
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT_PATH = os.path.join(SCRIPT_DIR, "anki-search.py")
+FAKE_SERVER_PATH = os.path.join(SCRIPT_DIR, "anki-search-fake-server.py")
+
+# Modes of the startup benchmark: name, arguments, stdin, budget in milliseconds of
+# imports on top of the bare interpreter, and modules the mode must not import.
+# Only the search modes may load SQLite (mirror, cache, collection), hashing and the text
+# helpers of ranking and the lemma index. (http.client loads unicodedata for host names.)
+SEARCH_ONLY_MODULES = ("sqlite3", "hashlib", "html", "heapq")
+STARTUP_MODES = [
+    ("help", ["--help"], None, 20, ("requests", "pyperclip", "http.client", "unicodedata", *SEARCH_ONLY_MODULES)),
+    ("browse-query", ["--browse-query", "deck:Deutsch::A1"], None, 45,
+     ("requests", "pyperclip", "http.server", "multiprocessing.connection", "logging", *SEARCH_ONLY_MODULES)),
+    ("browse-query --no-wait", ["--browse-query", "deck:Deutsch::A1", "--no-wait"], None, 45,
+     ("requests", "pyperclip", "http.client", "http.server", "unicodedata", *SEARCH_ONLY_MODULES)),
+    ("query", ["--query", "ver", "--no-cache"], None, 200, ("pyperclip", "http.server", "multiprocessing.connection")),
+    ("query --transport stdlib", ["--query", "ver", "--no-cache", "--transport", "stdlib"], None, 80,
+     ("requests", "pyperclip", "http.server", "multiprocessing.connection")),
+    ("query-file", ["--query-file", "-", "--no-cache"], b"ver\ngever\n", 200, ("pyperclip", "http.server")),
+]
+
+def _load(name: str, path: str):
+    """Imports a script as a module (the hyphenated file names are not valid module names)."""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module  # Lets worker processes unpickle its functions.
+    spec.loader.exec_module(module)
+    return module
+
+def load_anki_search():
+    return _load("anki_search", SCRIPT_PATH)
+
+def load_fake_server():
+    return _load("anki_search_fake_server", FAKE_SERVER_PATH)
+
+# --- Helpers ---
+
+def build_mirror(anki_search, path: str, notes: list[dict], chunk_size: int = 10_000) -> float:
+    """Fills a mirror database with the given notes and returns the build time in seconds."""
+    started = time.perf_counter()
+    conn = anki_search._open_mirror(path)
+    with conn:
+        for start in range(0, len(notes), chunk_size):
+            anki_search._upsert_notes(conn, notes[start:start + chunk_size], {})
+    conn.close()
+    return time.perf_counter() - started
+
+def measure(function, repeat: int) -> list[float]:
+    """Calls function() repeat times and returns the wall times in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+# --- Benchmarks ---
+
+def bench_trigram(args: argparse.Namespace):
+    anki_search = load_anki_search()
+    fake_server = load_fake_server()
+    synthetic_notes = fake_server.synthetic_notes
+    rng = random.Random(args.seed)
+    print(f"{'notes':>9} {'build s':>8} {'mode':<10} {'p50 ms':>8} {'p95 ms':>8}")
+    for size in args.sizes:
+        notes = synthetic_notes(size, seed=args.seed)
+        # Terms taken from the collection itself, so every lookup has at least one hit.
+        terms = [notes[rng.randrange(size)]["fields"]["WordSource"]["value"][1:] or "verst" for _ in range(args.repeat)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "mirror.sqlite3")
+            build_time = build_mirror(anki_search, path, notes)
+            modes = [("index", True), ("scan", False)]
+            for name, use_index in modes:
+                term_iter = iter(terms)
+                timings = measure(lambda: anki_search.search_mirror(next(term_iter), "word", path=path, use_index=use_index),
+                                  args.repeat)
+                print(f"{size:>9} {build_time:>8.1f} {name:<10} {statistics.median(timings):>8.2f} {percentile(timings, 0.95):>8.2f}")
+        if args.anki_connect:
+            # The same notes and terms, searched with the query --query sends to AnkiConnect.
+            server, url = fake_server.start_in_thread(fake_server.FakeCollection(notes))
+            anki_search.ANKI_CLIENT.url = url
+            term_iter = iter(terms)
+            timings = measure(lambda: anki_search._anki_invoke(
+                "findCards", query=anki_search.build_search_query(next(term_iter), "word")), args.repeat)
+            print(f"{size:>9} {'-':>8} {'findCards':<10} {statistics.median(timings):>8.2f} {percentile(timings, 0.95):>8.2f}")
+            server.shutdown()
+            server.server_close()
+
+def run_cli(arguments: list[str], env: dict, stdin: bytes | None = None) -> tuple[float, int]:
+    """
+    Runs anki-search.py in a fresh interpreter, as a hotkey would.
+
+    Returns:
+        The wall time in milliseconds and the peak RSS of the child in KiB
+        (0 where the platform does not report it).
+    """
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, SCRIPT_PATH, *arguments], env=env, stdin=subprocess.PIPE,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if stdin:
+        process.stdin.write(stdin)
+    process.stdin.close()
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        # ru_maxrss is in KiB on Linux and in bytes on macOS.
+        peak_rss = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+    else:
+        process.wait()
+        peak_rss = 0
+    elapsed = (time.perf_counter() - started) * 1000
+    if process.returncode:
+        raise RuntimeError(f"anki-search.py {' '.join(arguments)} exited with status {process.returncode}")
+    return elapsed, peak_rss
+
+def bench_e2e(args: argparse.Namespace):
+    fake_server = load_fake_server()
+    rng = random.Random(args.seed)
+    print(f"{'notes':>9} {'mode':<8} {'p50 ms':>8} {'p95 ms':>8} {'items/s':>9} {'RSS MiB':>8}")
+    for size in args.sizes:
+        notes = fake_server.synthetic_notes(size, seed=args.seed, cards_per_note=args.cards_per_note)
+        server, url = fake_server.start_in_thread(fake_server.FakeCollection(notes))
+        words = [note["fields"]["WordSource"]["value"] for note in notes if note["fields"]["WordSource"]["value"]]
+        with tempfile.TemporaryDirectory() as home:
+            # A private home directory keeps the real mirror, cache and breaker file out of the run.
+            env = dict(os.environ, HOME=home, USERPROFILE=home, ANKI_CONNECT_URL=url)
+            common = ["--no-cache", "--no-mirror"]
+            batch_terms = "\n".join(rng.choice(words) for _ in range(args.batch_terms)).encode("utf-8")
+            modes = [
+                ("query", lambda: run_cli(["--query", rng.choice(words)[1:], *common], env), 1),
+                ("browse", lambda: run_cli(["--browse-query", f'"WordSource:{rng.choice(words)}"'], env), 1),
+                ("batch", lambda: run_cli(["--query-file", "-", "--batch-size", str(args.batch_size), *common],
+                                          env, stdin=batch_terms), args.batch_terms),
+            ]
+            for name, run, items in modes:
+                timings, peak_rss = [], 0
+                for _ in range(args.repeat):
+                    elapsed, rss = run()
+                    timings.append(elapsed)
+                    peak_rss = max(peak_rss, rss)
+                throughput = items * len(timings) / (sum(timings) / 1000)
+                print(f"{size:>9} {name:<8} {statistics.median(timings):>8.1f} {percentile(timings, 0.95):>8.1f} "
+                      f"{throughput:>9.1f} {peak_rss / 1024:>8.1f}")
+        server.shutdown()
+        server.server_close()
+
+def legacy_print_cards(cards, html_output: bool):
+    """The renderer before the formatter layer: one print() per field and a flush per card."""
+    for count, card in enumerate(cards):
+        if count:
+            print("<br><br>" if html_output else "\t")
+        if html_output:
+            lines = []
+            if card['WordSource']:
+                line = f"{card['WordSource']}"
+                if card['WordDestination']:
+                    line += f" - {card['WordDestination']}"
+                lines.append(line)
+            if card['WordSourceIPA']: lines.append(f"[{card['WordSourceIPA']}]")
+            if card['WordSourceInflectedForm']: lines.append(f"{card['WordSourceInflectedForm']}")
+            if card['SentenceSource']: lines.append(f"{card['SentenceSource']}")
+            if card['SentenceDestination']: lines.append(f"- {card['SentenceDestination']}")
+            if card['SentenceDestination2']: lines.append(f"- {card['SentenceDestination2']}")
+            if card['WordSourceMorphologyAI']: lines.append(f"{card['WordSourceMorphologyAI']}")
+            if card['DeckName']: lines.append(f"deck:{card['DeckName']}")
+            print("<br>\n".join(lines))
+        else:
+            if card['WordSource']:
+                print(f"{card['WordSource']}", end='')
+                if card['WordDestination']:
+                    print(f" — {card['WordDestination']}")
+                else:
+                    print("")
+            if card['WordSourceIPA']: print(f"[{card['WordSourceIPA']}]")
+            if card['WordSourceInflectedForm']: print(f"{card['WordSourceInflectedForm']}")
+            if card['SentenceSource']: print(f"{card['SentenceSource']}")
+            if card['SentenceDestination']: print(f"- {card['SentenceDestination']}")
+            if card['SentenceDestination2']: print(f"- {card['SentenceDestination2']}")
+            if card['WordSourceMorphologyAI']: print(f"{card['WordSourceMorphologyAI']}")
+            if card['DeckName']: print(f"deck:{card['DeckName']}")
+        sys.stdout.flush()
+
+def record_memory(build) -> int:
+    """Returns the bytes still allocated by the object that build() returns."""
+    tracemalloc.start()
+    records = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+    return size
+
+def bench_render(args: argparse.Namespace):
+    anki_search = load_anki_search()
+    synthetic_notes = load_fake_server().synthetic_notes
+    print(f"{'cards':>9} {'mode':<12} {'p50 ms':>8} {'p95 ms':>8} {'cards/s':>10}")
+    for size in args.sizes:
+        items = [{"fields": note["fields"], "deckName": note["deckName"]} for note in synthetic_notes(size, seed=args.seed)]
+        cards = anki_search._parse_cards(items, html_output=False)
+        # Output goes to the null device, as a captured stdout that is never read would.
+        with open(os.devnull, "w", encoding="utf-8") as sink, contextlib.redirect_stdout(sink):
+            modes = [
+                ("legacy", lambda: legacy_print_cards(cards, False)),
+                ("legacy-html", lambda: legacy_print_cards(cards, True)),
+                *((name, lambda name=name: anki_search.print_results(cards, name)) for name in anki_search.OUTPUT_FORMATS),
+            ]
+            results = [(name, measure(run, args.repeat)) for name, run in modes]
+        for name, timings in results:
+            median = statistics.median(timings)
+            print(f"{size:>9} {name:<12} {median:>8.2f} {percentile(timings, 0.95):>8.2f} {size / (median / 1000):>10.0f}")
+
+        dict_bytes = record_memory(lambda: [card.as_dict() for card in cards])
+        card_bytes = record_memory(lambda: [anki_search.Card(*(card[name] for name in anki_search.CARD_FIELDS))
+                                            for card in cards])
+        print(f"{size:>9} records: dict {dict_bytes / size:.0f} B/card, Card {card_bytes / size:.0f} B/card "
+              "(field strings shared)")
+
+def legacy_strip_html(text: str) -> str:
+    """The field cleaner before the one-pass engine: recompiles its pattern per call, keeps entities."""
+    clean = re.compile('<.*?>')
+    text = re.sub(clean, ' ', text)
+    return ' '.join(text.split())
+
+def bench_strip(args: argparse.Namespace):
+    anki_search = load_anki_search()
+    synthetic_notes = load_fake_server().synthetic_notes
+    print(f"{'cards':>9} {'mode':<14} {'p50 ms':>8} {'MB/s':>8}")
+    for size in args.sizes:
+        rows = [[note["fields"][name]["value"] for name in anki_search.MIRROR_FIELDS]
+                for note in synthetic_notes(size, seed=args.seed)]
+        # Real fields carry more markup than the synthetic ones: wrap them like Anki's editor does.
+        rows = [[f"<div>{value}&nbsp;</div><br>" if value else value for value in row] for row in rows]
+        values = [value for row in rows for value in row]
+        megabytes = sum(len(value.encode("utf-8")) for value in values) / 1_000_000
+        pool = anki_search.FieldCleaner(processes=args.processes, parallel_min_chars=0)
+        pool.clean(values)  # Starts the worker processes outside the timed runs.
+        modes = [
+            ("legacy", lambda: [legacy_strip_html(value) for value in values]),
+            ("per-field", lambda: [anki_search._strip_html(value) for value in values]),
+            ("batch", lambda: anki_search.FieldCleaner().clean_rows(rows)),
+            (f"pool x{args.processes}", lambda: pool.clean_rows(rows)),
+        ]
+        for name, run in modes:
+            timings = measure(run, args.repeat)
+            median = statistics.median(timings)
+            print(f"{size:>9} {name:<14} {median:>8.1f} {megabytes / (median / 1000):>8.1f}")
+        pool.close()
+
+def import_profile(arguments: list[str], env: dict, stdin: bytes | None = None) -> tuple[float, set[str]]:
+    """
+    Runs a fresh interpreter with -X importtime.
+
+    Returns:
+        The total import time in milliseconds (the cumulative times of the top-level
+        imports) and the names of all imported modules.
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", *arguments], env=env, input=stdin or b"",
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if process.returncode:
+        raise RuntimeError(f"{' '.join(arguments)} exited with status {process.returncode}")
+    total, modules = 0, set()
+    for line in process.stderr.decode("utf-8", "replace").splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # The header line.
+        modules.add(name.strip())
+        if not name.startswith("  "):  # Nested imports are part of their parent's cumulative time.
+            total += int(cumulative)
+    return total / 1000, modules
+
+def bench_startup(args: argparse.Namespace) -> int:
+    fake_server = load_fake_server()
+    notes = fake_server.synthetic_notes(args.notes, seed=args.seed)
+    server, url = fake_server.start_in_thread(fake_server.FakeCollection(notes))
+    failures = 0
+    # The --no-wait worker may still be running when the directory is removed.
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as home:
+        env = dict(os.environ, HOME=home, USERPROFILE=home, ANKI_CONNECT_URL=url)
+        baseline = statistics.median(import_profile(["-c", "pass"], env)[0] for _ in range(args.repeat))
+        print(f"Interpreter without anki-search.py: {baseline:.1f} ms of imports")
+        print(f"{'mode':<26} {'p50 ms':>8} {'max ms':>8} {'budget':>8}  result")
+        for name, arguments, stdin, budget, forbidden in STARTUP_MODES:
+            timings, imported = [], set()
+            for _ in range(args.repeat):
+                total, modules = import_profile([SCRIPT_PATH, *arguments], env, stdin)
+                timings.append(total - baseline)
+                imported |= modules
+            median = statistics.median(timings)
+            budget *= args.budget_scale
+            problems = [f"imports {module}" for module in forbidden if module in imported]
+            if median > budget:
+                problems.insert(0, "over budget")
+            failures += bool(problems)
+            print(f"{name:<26} {median:>8.1f} {max(timings):>8.1f} {budget:>8.0f}  {', '.join(problems) or 'ok'}")
+    server.shutdown()
+    server.server_close()
+    return 1 if failures else 0
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmarks for anki-search.py.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    trigram = subparsers.add_parser("trigram", help="Trigram index lookups vs. linear scan of the local mirror.")
+    trigram.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                         help="Synthetic collection sizes in notes (default: 10000 100000 1000000).")
+    trigram.add_argument("--repeat", type=int, default=50, help="Lookups per size and mode (default: 50).")
+    trigram.add_argument("--seed", type=int, default=1, help="Random seed for the synthetic collection.")
+    trigram.add_argument("--anki-connect", action="store_true",
+                         help="Also time findCards with the query of --query through the fake AnkiConnect server "
+                              "holding the same synthetic notes.")
+    trigram.set_defaults(func=bench_trigram)
+
+    e2e = subparsers.add_parser("e2e", help="End-to-end latency against the fake AnkiConnect server.")
+    e2e.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                     help="Synthetic collection sizes in notes (default: 1000 10000 100000).")
+    e2e.add_argument("--repeat", type=int, default=20, help="Invocations per size and mode (default: 20).")
+    e2e.add_argument("--cards-per-note", type=int, default=2, help="Cards per synthetic note (default: 2).")
+    e2e.add_argument("--batch-terms", type=int, default=100, help="Terms per --query-file run (default: 100).")
+    e2e.add_argument("--batch-size", type=int, default=50, help="--batch-size passed to anki-search.py (default: 50).")
+    e2e.add_argument("--seed", type=int, default=1, help="Random seed for the synthetic collection.")
+    e2e.set_defaults(func=bench_e2e)
+
+    render = subparsers.add_parser("render", help="Output formatters vs. the print-per-field renderer.")
+    render.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 10_000],
+                        help="Number of cards rendered per run (default: 100 1000 10000).")
+    render.add_argument("--repeat", type=int, default=20, help="Runs per size and mode (default: 20).")
+    render.add_argument("--seed", type=int, default=1, help="Random seed for the synthetic cards.")
+    render.set_defaults(func=bench_render)
+
+    strip = subparsers.add_parser("strip", help="HTML field cleaning throughput in MB/s.")
+    strip.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                       help="Number of cards cleaned per run (default: 1000 10000 100000).")
+    strip.add_argument("--repeat", type=int, default=10, help="Runs per size and mode (default: 10).")
+    strip.add_argument("--processes", type=int, default=max(2, os.cpu_count() or 2),
+                       help="Worker processes of the pool mode (default: number of CPUs, at least 2).")
+    strip.add_argument("--seed", type=int, default=1, help="Random seed for the synthetic cards.")
+    strip.set_defaults(func=bench_strip)
+
+    startup = subparsers.add_parser("startup", help="Cold-start import time per mode, checked against budgets.")
+    startup.add_argument("--repeat", type=int, default=5, help="Runs per mode (default: 5).")
+    startup.add_argument("--budget-scale", type=float, default=1.0,
+                         help="Multiplies every budget, e.g. 2 on a slow machine (default: 1).")
+    startup.add_argument("--notes", type=int, default=1_000, help="Notes of the fake collection (default: 1000).")
+    startup.add_argument("--seed", type=int, default=1, help="Random seed for the synthetic collection.")
+    startup.set_defaults(func=bench_startup)
+
+    return parser
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    arguments = build_parser().parse_args()
+    sys.exit(arguments.func(arguments) or 0)
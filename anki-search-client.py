@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# anki-search-client.py
+
+"""
+Thin client for the anki-search.py daemon.
+
+Forwards its command-line arguments (--query, --browse-query, --browse-clipboard, ...)
+to a running 'anki-search.py --serve' process and prints the reply, so a hotkey
+lookup does not pay for loading anki-search.py and its imports every time.
+If no daemon is running, the arguments are executed in-process by anki-search.py.
+The working directory, and the standard input of '--query-file -' and '--prefetch -',
+are sent along, so relative paths and pipes work as they do without the daemon.
+
+Only uses the Python standard library.
+"""
+
+import io
+import json
+import os
+import runpy
+import sys
+from multiprocessing.connection import AuthenticationError, Client
+
+# Must match the daemon address in anki-search.py.
+APP_DIR = os.path.join(os.path.expanduser("~"), ".anki-search")
+if os.name == "nt":
+    DAEMON_FAMILY = "AF_PIPE"
+    DAEMON_ADDRESS = r"\\.\pipe\anki-search"
+else:
+    DAEMON_FAMILY = "AF_UNIX"
+    DAEMON_ADDRESS = os.path.join(APP_DIR, "daemon.sock")
+DAEMON_KEY_PATH = os.path.join(APP_DIR, "daemon.key")
+# Options that read standard input when given '-'.
+STDIN_OPTIONS = ("--query-file", "--prefetch")
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "anki-search.py")
+
+def reads_stdin(argv: list[str]) -> bool:
+    """Whether the arguments read standard input ('--query-file -' or '--prefetch -')."""
+    return any(argument in [f"{option}=-" for option in STDIN_OPTIONS] or argument == "-" and previous in STDIN_OPTIONS
+               for previous, argument in zip([""] + argv, argv))
+
+def forward(argv: list[str], stdin: str | None = None) -> dict | None:
+    """
+    Sends the arguments to the daemon and waits for its reply.
+
+    Args:
+        argv (list[str]): The command-line arguments to forward.
+        stdin (str | None): Standard input for '--query-file -' and '--prefetch -'.
+
+    Returns:
+        The reply as a dictionary with "output" and "status" keys,
+        or None if no daemon is listening.
+    """
+    try:
+        with open(DAEMON_KEY_PATH, "rb") as handle:
+            authkey = handle.read()
+        conn = Client(DAEMON_ADDRESS, family=DAEMON_FAMILY, authkey=authkey)
+    except (OSError, EOFError, AuthenticationError):
+        return None  # No daemon running (missing key or socket, refused connection or no pipe).
+    request = {"argv": argv, "cwd": os.getcwd()}
+    if stdin is not None:
+        request["stdin"] = stdin
+    with conn:
+        try:
+            conn.send_bytes(json.dumps(request).encode("utf-8"))
+            return json.loads(conn.recv_bytes())
+        except (EOFError, OSError, ValueError):
+            return None
+
+def run_in_process(argv: list[str]):
+    """Falls back to executing anki-search.py inside this interpreter."""
+    sys.argv = [SCRIPT_PATH] + argv
+    runpy.run_path(SCRIPT_PATH, run_name="__main__")
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+    stdin_text = sys.stdin.read() if reads_stdin(arguments) else None
+    reply = forward(arguments, stdin_text)
+    if reply is None:
+        if stdin_text is not None:
+            sys.stdin = io.StringIO(stdin_text)  # Already consumed above.
+        run_in_process(arguments)
+    else:
+        sys.stdout.write(reply.get("output", ""))
+        sys.exit(reply.get("status", 0))
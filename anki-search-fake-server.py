@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# anki-search-fake-server.py
+
+"""
+Stand-in AnkiConnect server for testing and benchmarking anki-search.py without Anki.
+
+Serves a generated synthetic collection over the AnkiConnect JSON-RPC protocol
+(version 6). Implemented actions: findCards, findNotes, cardsInfo, notesInfo,
+notesModTime, getDecks, deckNames, getDeckStats, guiBrowse and multi.
+
+The search syntax covers what anki-search.py sends: quoted or bare "Field:value"
+terms with the '*' and '_' wildcards (including "Field:_*" and the empty "Field:"),
+"edited:N", bare words, negation with '-', 'OR', implicit AND and parentheses.
+
+Example:
+    ./anki-search-fake-server.py --notes 100000 --port 8766
+    ANKI_CONNECT_URL=http://localhost:8766 ./anki-search.py --query "ver"
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_FIELDS = (
+    "WordSource", "WordSourceIPA", "WordDestination", "SentenceSource",
+    "WordSourceInflectedForm", "SentenceDestination", "SentenceDestination2",
+    "WordSourceMorphologyAI",
+)
+SYLLABLES = ["ge", "hen", "la", "mor", "sch", "ein", "ung", "ter", "ka", "bel", "ri", "st", "au", "ß", "ü", "ra", "zu", "ver"]
+DECKS = ["Deutsch::A1", "Deutsch::A2", "Deutsch::B1", "Deutsch::Sätze"]
+
+# --- Synthetic collections ---
+
+def synthetic_word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+def synthetic_notes(count: int, seed: int = 1, fields: tuple[str, ...] = DEFAULT_FIELDS,
+                    cards_per_note: int = 1) -> list[dict]:
+    """
+    Generates notesInfo-shaped notes.
+
+    Three quarters of the notes are vocabulary notes (WordSource set), the rest are
+    sentence notes with an empty WordSource, as in the real decks. Fields that are
+    not part of the default schema are filled with random words.
+
+    Args:
+        count (int): Number of notes.
+        seed (int): Random seed, so that runs are reproducible.
+        fields (tuple[str, ...]): Field names of the note type.
+        cards_per_note (int): Number of cards (templates) per note.
+    """
+    rng = random.Random(seed)
+    notes = []
+    base_id = 1_600_000_000_000
+    now = int(time.time())
+    for i in range(count):
+        if i % 4:
+            word = synthetic_word(rng)
+            known = {
+                "WordSource": word,
+                "WordSourceIPA": word,
+                "WordDestination": f"translation of {word}",
+                "WordSourceInflectedForm": ", ".join(word + suffix for suffix in ("e", "st", "t")),
+                "WordSourceMorphologyAI": f"<i>Verb</i>, {word}",
+            }
+        else:
+            sentence = " ".join(synthetic_word(rng) for _ in range(rng.randint(4, 8)))
+            known = {
+                "WordSource": "",
+                "SentenceSource": f"<b>{sentence}</b>",
+                "SentenceDestination": f"translation of {sentence}",
+            }
+        values = {name: known.get(name, "" if name in DEFAULT_FIELDS else synthetic_word(rng)) for name in fields}
+        note_id = base_id + i
+        notes.append({
+            "noteId": note_id,
+            "modelName": "Synthetic",
+            "tags": [],
+            "mod": now - rng.randrange(400 * 86400),
+            "cards": [note_id * 10 + template for template in range(cards_per_note)],
+            "fields": {name: {"value": value, "order": order} for order, (name, value) in enumerate(values.items())},
+            "deckName": DECKS[i % len(DECKS)],
+        })
+    return notes
+
+# --- Search ---
+
+TOKEN_PATTERN = re.compile(r'\s*(\(|\)|-?"(?:[^"\\]|\\.)*"|[^\s()]+)')
+
+def _tokenize(query: str) -> list[str]:
+    return [token for token in TOKEN_PATTERN.findall(query) if token]
+
+def _wildcard(value: str) -> re.Pattern:
+    """Translates an Anki search value with '*' and '_' wildcards into a full-match regex."""
+    pattern = "".join(".*" if char == "*" else "." if char == "_" else re.escape(char) for char in value)
+    return re.compile(pattern, re.IGNORECASE | re.DOTALL)
+
+def _term(token: str):
+    """Compiles a single search term into a predicate over a note."""
+    negate = token.startswith("-")
+    token = token[1:] if negate else token
+    if token.startswith('"') and token.endswith('"'):
+        token = token[1:-1].replace('\\"', '"')
+
+    name, colon, value = token.partition(":")
+    if colon and name.lower() == "edited":
+        cutoff = time.time() - int(value) * 86400
+        predicate = lambda note: note["mod"] >= cutoff
+    elif colon and name.lower() in ("deck", "note", "tag"):
+        pattern = _wildcard(value)
+        key = {"deck": "deckName", "note": "modelName", "tag": "tags"}[name.lower()]
+        predicate = lambda note: any(pattern.fullmatch(item) for item in
+                                     (note[key] if isinstance(note[key], list) else [note[key]]))
+    elif colon:
+        pattern = _wildcard(value)
+        lowered = name.lower()
+
+        def predicate(note):
+            for field_name, field in note["fields"].items():
+                if field_name.lower() == lowered:
+                    return bool(pattern.fullmatch(field["value"]))
+            return False  # Notes without the field never match.
+    else:
+        pattern = _wildcard(f"*{token}*")
+        predicate = lambda note: any(pattern.fullmatch(field["value"]) for field in note["fields"].values())
+    return (lambda note: not predicate(note)) if negate else predicate
+
+def compile_query(query: str):
+    """
+    Compiles an Anki search string into a predicate over notes.
+
+    Grammar: or_expr := and_expr ('OR' and_expr)*; and_expr := atom+;
+    atom := '(' or_expr ')' | term.
+    """
+    tokens = _tokenize(query)
+    position = 0
+
+    def or_expr():
+        nonlocal position
+        parts = [and_expr()]
+        while position < len(tokens) and tokens[position].upper() == "OR":
+            position += 1
+            parts.append(and_expr())
+        return parts[0] if len(parts) == 1 else (lambda note: any(part(note) for part in parts))
+
+    def and_expr():
+        nonlocal position
+        parts = []
+        while position < len(tokens) and tokens[position] != ")" and tokens[position].upper() != "OR":
+            if tokens[position].upper() == "AND":
+                position += 1
+                continue
+            parts.append(atom())
+        return lambda note: all(part(note) for part in parts)
+
+    def atom():
+        nonlocal position
+        token = tokens[position]
+        position += 1
+        if token == "(":
+            inner = or_expr()
+            position += 1  # Skip the closing parenthesis.
+            return inner
+        return _term(token)
+
+    return or_expr() if tokens else (lambda note: True)
+
+# --- AnkiConnect actions ---
+
+class FakeCollection:
+    """In-memory collection answering AnkiConnect actions."""
+
+    def __init__(self, notes: list[dict]):
+        self.notes = {note["noteId"]: note for note in notes}
+        self.cards = {card_id: note for note in notes for card_id in note["cards"]}
+        self.browse_queries = []
+
+    def _find(self, query: str) -> list[dict]:
+        predicate = compile_query(query)
+        return [note for note in self.notes.values() if predicate(note)]
+
+    def _card_info(self, card_id: int) -> dict:
+        note = self.cards[card_id]
+        fields = note["fields"]
+        front = "".join(f"<div>{field['value']}</div>" for field in list(fields.values())[:2])
+        back = "".join(f"<div>{field['value']}</div>" for field in fields.values())
+        return {
+            "cardId": card_id, "note": note["noteId"], "deckName": note["deckName"],
+            "modelName": note["modelName"], "fieldOrder": card_id % 10, "fields": fields,
+            "question": f"<style>.card {{ font-family: arial; }}</style>{front}",
+            "answer": f"<style>.card {{ font-family: arial; }}</style>{back}",
+            "css": ".card { font-family: arial; }", "interval": 0, "due": 0, "reps": 0,
+            "lapses": 0, "left": 0, "mod": note["mod"], "ord": card_id % 10, "type": 0, "queue": 0,
+        }
+
+    def handle(self, action: str, params: dict):
+        if action == "findCards":
+            return [card_id for note in self._find(params["query"]) for card_id in note["cards"]]
+        if action == "findNotes":
+            return [note["noteId"] for note in self._find(params["query"])]
+        if action == "cardsInfo":
+            return [self._card_info(card_id) if card_id in self.cards else {} for card_id in params["cards"]]
+        if action == "notesInfo":
+            return [{key: value for key, value in self.notes[note_id].items() if key != "deckName"}
+                    if note_id in self.notes else {} for note_id in params["notes"]]
+        if action == "notesModTime":
+            return [{"noteId": note_id, "mod": self.notes[note_id]["mod"]} for note_id in params["notes"] if note_id in self.notes]
+        if action == "getDecks":
+            decks = {}
+            for card_id in params["cards"]:
+                if card_id in self.cards:
+                    decks.setdefault(self.cards[card_id]["deckName"], []).append(card_id)
+            return decks
+        if action == "deckNames":
+            return sorted({note["deckName"] for note in self.notes.values()})
+        if action == "getDeckStats":
+            counts = {}
+            for note in self.notes.values():
+                counts[note["deckName"]] = counts.get(note["deckName"], 0) + len(note["cards"])
+            return {str(index): {"deck_id": index, "name": name, "new_count": 0, "learn_count": 0, "review_count": 0,
+                                 "total_in_deck": counts.get(name, 0)}
+                    for index, name in enumerate(params["decks"], start=1)}
+        if action == "guiBrowse":
+            self.browse_queries.append(params["query"])
+            return [card_id for note in self._find(params["query"]) for card_id in note["cards"]]
+        if action == "multi":
+            results = []
+            for entry in params["actions"]:
+                try:
+                    results.append({"result": self.handle(entry["action"], entry.get("params", {})), "error": None})
+                except Exception as e:
+                    results.append({"result": None, "error": str(e)})
+            return results
+        raise ValueError(f"unsupported action: {action}")
+
+def make_server(collection: FakeCollection, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    """Creates (but does not start) an HTTP server answering AnkiConnect requests from the collection."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like AnkiConnect.
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                body = {"result": collection.handle(request["action"], request.get("params", {})), "error": None}
+            except Exception as e:
+                body = {"result": None, "error": str(e)}
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+def start_in_thread(collection: FakeCollection, host: str = "127.0.0.1", port: int = 0) -> tuple[ThreadingHTTPServer, str]:
+    """Starts a server in a background thread and returns it with its URL (port 0 picks a free port)."""
+    server = make_server(collection, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a synthetic collection over the AnkiConnect protocol.")
+    parser.add_argument("--notes", type=int, default=10_000, help="Number of synthetic notes (default: 10000).")
+    parser.add_argument("--cards-per-note", type=int, default=1, help="Cards per note (default: 1).")
+    parser.add_argument("--fields", nargs="+", default=list(DEFAULT_FIELDS), help="Field names of the synthetic note type.")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the synthetic collection.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1).")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765).")
+    args = parser.parse_args()
+
+    fake_collection = FakeCollection(synthetic_notes(args.notes, args.seed, tuple(args.fields), args.cards_per_note))
+    print(f"Serving {args.notes} synthetic notes on http://{args.host}:{args.port}")
+    make_server(fake_collection, args.host, args.port).serve_forever()
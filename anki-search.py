@@ -10,15 +10,715 @@ This script provides two main functionalities:
 2.  Opening the Anki card browser directly with a specified search query, which can
     be provided as an argument or taken from the system clipboard.
 
+The script can also run as a resident daemon (--serve) that keeps the modules
+loaded behind a local Unix socket (or a named pipe on Windows); the companion
+'anki-search-client.py' forwards command-line arguments to it.
+
 Requires the AnkiConnect add-on to be installed and Anki to be running.
-Requires external libraries: 'requests' and 'pyperclip'.
+Uses the external libraries 'requests' (if it is installed; the standard library's
+http.client is used otherwise) and 'pyperclip' (for the clipboard options).
 Install them with: pip install requests pyperclip
+
+Modules that only some modes need (the two libraries, the HTTP server, the daemon
+socket, process pools, logging, SQLite for the mirror, cache and collection, ...) are
+imported by those modes, and the built-in schema is compiled on first use, so a single
+--browse-query does not pay for them at start-up.
 """
 
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import argparse
-import requests
+import collections
+import contextlib
+import io
+import itertools
+import json
+import math
+import os
 import re
-import pyperclip
+import sys
+import threading
+
+_IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
+
+# Location of the daemon's listening socket (or named pipe on Windows).
+# Keep in sync with anki-search-client.py.
+APP_DIR = os.path.join(os.path.expanduser("~"), ".anki-search")
+if os.name == "nt":
+    DAEMON_FAMILY = "AF_PIPE"
+    DAEMON_ADDRESS = r"\\.\pipe\anki-search"
+else:
+    DAEMON_FAMILY = "AF_UNIX"
+    DAEMON_ADDRESS = os.path.join(APP_DIR, "daemon.sock")
+# Random key written by the daemon at start; only clients that can read it may connect.
+DAEMON_KEY_PATH = os.path.join(APP_DIR, "daemon.key")
+
+# Address of the GoldenDict dictionary endpoint (--http-server).
+HTTP_HOST = "127.0.0.1"
+HTTP_PORT = 8770
+
+ANKI_CONNECT_URL = os.environ.get("ANKI_CONNECT_URL", "http://localhost:8765")
+# Connection settings of the AnkiConnect client (seconds / attempts).
+CONNECT_TIMEOUT = 1.0
+READ_TIMEOUT = 30.0
+RETRIES = 2
+RETRY_BACKOFF = 0.1
+# After Anki was found unreachable, further requests fail immediately for this long.
+# The state is kept in a file so that it is shared by separate hotkey invocations.
+BREAKER_COOLDOWN = 5.0
+BREAKER_PATH = os.path.join(APP_DIR, "anki-unreachable")
+
+# Local SQLite mirror of the note fields read by the search.
+MIRROR_PATH = os.path.join(APP_DIR, "mirror.sqlite3")
+MIRROR_FIELDS = (
+    "WordSource", "WordSourceIPA", "WordDestination", "SentenceSource",
+    "WordSourceInflectedForm", "SentenceDestination", "SentenceDestination2",
+    "WordSourceMorphologyAI",
+)
+MIRROR_CHUNK_SIZE = 500
+# Note types and search modes (--schema). The fields above are the roles of the
+# output; a note type maps them onto its own field names (a role it does not list
+# keeps its name, a role mapped to null is left empty). A search mode matches the
+# term in its "search" roles, needs one of its "require_any" roles to be filled
+# and all of its "require_empty" roles to be empty. The compiled schema is cached
+# in SCHEMA_PLAN_PATH until the file changes.
+SCHEMA_PATH = os.environ.get("ANKI_SEARCH_SCHEMA", os.path.join(APP_DIR, "schema.json"))
+SCHEMA_PLAN_PATH = os.path.join(APP_DIR, "schema-plan.json")
+SCHEMA_PLAN_VERSION = 1
+DEFAULT_SCHEMA = {
+    "note_types": [{"fields": {}}],
+    "modes": {
+        "word": {"search": ["WordSource", "WordSourceInflectedForm"],
+                 "require_any": ["WordDestination", "SentenceDestination", "WordSourceMorphologyAI"]},
+        "sentence": {"search": ["SentenceSource"], "require_any": ["SentenceDestination"],
+                     "require_empty": ["WordSource"]},
+    },
+}
+# Placeholder for the search term in compiled query templates.
+SCHEMA_TERM_SLOT = "\x00"
+# Collection read by the direct backend (--backend direct); the default is the first
+# profile of a standard Anki installation.
+if os.name == "nt":
+    _ANKI_BASE = os.path.join(os.environ.get("APPDATA", os.path.expanduser("~")), "Anki2")
+elif sys.platform == "darwin":
+    _ANKI_BASE = os.path.join(os.path.expanduser("~"), "Library", "Application Support", "Anki2")
+else:
+    _ANKI_BASE = os.path.join(os.environ.get("XDG_DATA_HOME", os.path.join(os.path.expanduser("~"), ".local", "share")), "Anki2")
+COLLECTION_PATH = os.environ.get("ANKI_COLLECTION", os.path.join(_ANKI_BASE, "User 1", "collection.anki2"))
+# On-disk LRU cache of rendered --query output.
+CACHE_PATH = os.path.join(APP_DIR, "cache.sqlite3")
+CACHE_MAX_ENTRIES = 500
+CACHE_MAX_BYTES = 5 * 1024 * 1024
+# Seconds during which a verified collection fingerprint is trusted without asking Anki.
+CACHE_CHECK_INTERVAL = 30
+# Number of IDs fetched per cardsInfo/notesInfo request when streaming results.
+PAGE_SIZE = 200
+# Prefetching (--prefetch): words shorter than PREFETCH_MIN_LENGTH letters are skipped,
+# and at most PREFETCH_MAX_WORDS distinct words of a text are looked up, but never more
+# than PREFETCH_CACHE_SHARE of --cache-entries, so a prefetch leaves room for the hot cache.
+PREFETCH_MIN_LENGTH = 3
+PREFETCH_MAX_WORDS = 300
+PREFETCH_CACHE_SHARE = 0.5
+PREFETCH_WORD_PATTERN = re.compile(rf"[^\W\d_]{{{PREFETCH_MIN_LENGTH},}}")
+# Clipboard watching (--watch-clipboard): polling and debounce intervals in seconds,
+# number of remembered queries, and how long a repeated query is ignored.
+WATCH_POLL_INTERVAL = 0.25
+WATCH_DEBOUNCE = 0.5
+WATCH_HISTORY_SIZE = 50
+WATCH_DUPLICATE_WINDOW = 10.0
+# Fire-and-forget browsing (--no-wait): the latest queued query, the heartbeat file
+# of the background worker, and the log of what the worker sent. The worker waits
+# BROWSE_DEBOUNCE seconds of quiet before sending, and exits after BROWSE_WORKER_IDLE
+# idle seconds; a heartbeat older than BROWSE_HEARTBEAT_TIMEOUT means it is gone. While a
+# guiBrowse call is running (2-2.5 s in large collections), the heartbeat is refreshed
+# every BROWSE_HEARTBEAT_INTERVAL seconds from a side thread.
+BROWSE_SPOOL_PATH = os.path.join(APP_DIR, "browse-queue.json")
+BROWSE_WORKER_PATH = os.path.join(APP_DIR, "browse-worker")
+BROWSE_LOG_PATH = os.path.join(APP_DIR, "anki_search_log.txt")
+BROWSE_DEBOUNCE = 0.2
+BROWSE_POLL_INTERVAL = 0.05
+BROWSE_WORKER_IDLE = 10.0
+BROWSE_HEARTBEAT_TIMEOUT = 2.0
+BROWSE_HEARTBEAT_INTERVAL = 0.5
+# Clipboard content longer than this (or with more lines) is not a search query.
+WATCH_MAX_QUERY_LENGTH = 1000
+WATCH_MAX_QUERY_LINES = 3
+# Threads used to send AnkiConnect requests concurrently (--search-type all).
+WORKERS = 4
+# Match types of --search-type all, in output order.
+MATCH_TYPES = ("word", "sentence")
+# HTTP transports of the AnkiConnect client (--transport): "requests" keeps a pooled
+# session per thread, "stdlib" an http.client connection per thread; "auto" uses
+# requests if it is installed.
+TRANSPORTS = ("auto", "requests", "stdlib")
+# Requests sent and response bytes received from AnkiConnect by this process.
+TRANSPORT_STATS = {"requests": 0, "bytes": 0}
+_STATS_LOCK = threading.Lock()
+# Serializes mirror syncs started by concurrent lookups (--http-server).
+_SYNC_LOCK = threading.Lock()
+# Scopes of the trigram index: word fields (WordSource + WordSourceInflectedForm)
+# and sentence fields (SentenceSource).
+TRIGRAM_WORD_SCOPE = 0
+TRIGRAM_SENTENCE_SCOPE = 1
+# Lowercased search key columns of the mirror, by role.
+MIRROR_KEY_COLUMNS = {"WordSource": "word_key", "WordSourceInflectedForm": "inflected_key", "SentenceSource": "sentence_key"}
+# Lemma index (--search-type lemma): spelling variants folded to a common form,
+# separators between the entries of an inflection list, and words that are not
+# indexed on their own when they appear in a multi-word form ("ist gegangen").
+LEMMA_FOLDS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+LEMMA_SEPARATORS = re.compile(r"<br\s*/?>|</?(?:div|p|li)\b[^>]*>|[,;/|()\[\]\n]", re.IGNORECASE)
+LEMMA_STOPWORDS = frozenset({
+    "der", "die", "das", "den", "dem", "des", "ein", "eine", "einen", "einem", "einer", "eines",
+    "sich", "zu", "ist", "hat", "sein", "haben", "wird", "werden", "er", "sie", "es",
+})
+LEMMA_NEEDS_MIRROR = "Error: --search-type lemma needs the local mirror; run --sync once to build it."
+# Field cleaning: the character that joins the fields of a batch into one string
+# (str.split() does not treat it as whitespace), HTML tags (never spanning two fields),
+# the entities decoded without html.unescape(), and the batch size (in characters)
+# from which a cleaner with --clean-processes spreads the work over its process pool.
+FIELD_SEPARATOR = "\x00"
+HTML_TAG_PATTERN = re.compile(r"<[^>\x00]*>")
+COMMON_ENTITIES = (("&nbsp;", "\xa0"), ("&lt;", "<"), ("&gt;", ">"), ("&quot;", '"'))
+CLEAN_PARALLEL_MIN_CHARS = 4 * 1024 * 1024
+# Output formats (--format) and the fields of a printed card, in output order.
+OUTPUT_FORMATS = ("plain", "html", "json", "ndjson")
+CARD_FIELDS = (*MIRROR_FIELDS, "DeckName")
+
+class Profiler:
+    """
+    Collects named timing spans of one invocation.
+
+    Spans may be nested; each span records only its own time, without the time
+    spent in spans opened inside it, so the breakdown adds up to the wall time.
+    Spans opened in worker threads are recorded too (and may overlap).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        """Forgets all spans and restarts the wall clock."""
+        with self._lock:
+            self.spans = {}  # name -> [seconds, count]
+        self.started = time.perf_counter()
+
+    def add(self, name: str, seconds: float, count: int = 1):
+        """Records time measured elsewhere (e.g. interpreter start) under a span name."""
+        with self._lock:
+            entry = self.spans.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += count
+
+    @contextlib.contextmanager
+    def span(self, name: str):
+        """Times the enclosed block under the given name."""
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(0.0)  # Time spent in nested spans.
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.add(name, elapsed - nested)
+
+    def wall_time(self) -> float:
+        """Seconds since reset(), plus the time recorded before it (startup, imports)."""
+        with self._lock:
+            before = sum(seconds for name, (seconds, _) in self.spans.items() if name in ("startup", "import"))
+        return time.perf_counter() - self.started + before
+
+    def report(self) -> str:
+        """Formats the spans as a table, largest first."""
+        total = self.wall_time()
+        with self._lock:
+            spans = sorted(self.spans.items(), key=lambda item: item[1][0], reverse=True)
+        lines = [f"{'span':<24} {'ms':>9} {'count':>6} {'share':>6}"]
+        accounted = 0.0
+        for name, (seconds, count) in spans:
+            accounted += seconds
+            lines.append(f"{name:<24} {seconds * 1000:>9.1f} {count:>6} {seconds / total:>6.1%}")
+        lines.append(f"{'(other)':<24} {max(0.0, total - accounted) * 1000:>9.1f} {'':>6} {max(0.0, total - accounted) / total:>6.1%}")
+        lines.append(f"{'total':<24} {total * 1000:>9.1f}")
+        return "\n".join(lines)
+
+    def record(self) -> dict:
+        """Returns the spans in milliseconds, for the JSON lines timing log."""
+        with self._lock:
+            spans = {name: round(seconds * 1000, 3) for name, (seconds, _) in self.spans.items()}
+        return {"total_ms": round(self.wall_time() * 1000, 3), "spans": spans}
+
+PROFILER = Profiler()
+
+def _process_age() -> float | None:
+    """Seconds since the process was started (Linux only), i.e. interpreter start-up so far."""
+    try:
+        with open("/proc/self/stat", encoding="ascii") as handle:
+            # The command name (field 2) may contain spaces, so split after its closing parenthesis.
+            start_ticks = int(handle.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime", encoding="ascii") as handle:
+            uptime = float(handle.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+def _lazy_import(name: str):
+    """Imports a module when a mode first needs it; the time is added to the profile as import:<name>."""
+    if name in sys.modules:
+        __import__(name)  # Waits, under the import lock, for a module another thread is still importing.
+    else:
+        with PROFILER.span(f"import:{name}"):
+            __import__(name)  # Unlike importlib.import_module(), reported by -X importtime.
+    return sys.modules[name]
+
+# Time spent before main() runs, added to the first invocation's profile.
+_STARTUP_SPANS = {"import": _IMPORT_SECONDS}
+_PROCESS_AGE = _process_age()
+if _PROCESS_AGE is not None:
+    _STARTUP_SPANS["startup"] = max(0.0, _PROCESS_AGE - (time.perf_counter() - _IMPORT_STARTED))
+
+class Card:
+    """
+    One search result: the printed fields of a card (or note) and its deck.
+
+    Uses __slots__ instead of a per-card dictionary. card["WordSource"] still
+    works for callers written against the dictionaries returned earlier.
+    """
+    __slots__ = CARD_FIELDS
+
+    def __init__(self, *values: str):
+        for name, value in zip(CARD_FIELDS, values):
+            setattr(self, name, value)
+
+    def __getitem__(self, name: str) -> str:
+        return getattr(self, name)
+
+    def as_dict(self) -> dict[str, str]:
+        return {name: getattr(self, name) for name in CARD_FIELDS}
+
+def _schema_roles(value, where: str) -> list[str]:
+    """Validates a list of role names of a schema file."""
+    if not isinstance(value, list) or not all(role in MIRROR_FIELDS for role in value):
+        raise ValueError(f"{where} must be a list of the fields {', '.join(MIRROR_FIELDS)}")
+    return value
+
+def _any_of(conditions: list[str], separator: str = " OR ") -> str:
+    """Joins alternative search conditions, in parentheses if there is more than one."""
+    return conditions[0] if len(conditions) == 1 else f"({separator.join(conditions)})"
+
+def _search_term(text: str) -> str:
+    """Quotes a term of an Anki search, so that field and note type names may contain spaces."""
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def compile_schema(config: dict) -> dict:
+    """
+    Compiles a schema (see DEFAULT_SCHEMA) into the plan used by the searches.
+
+    The plan only holds JSON types, so it can be cached on disk. It contains
+    the AnkiConnect query template of every search mode (a list of literal parts
+    joined by the search term), the mirror conditions of every mode, the field
+    names of every note type in role order and the role positions of every mode.
+
+    A mode set to null is disabled. A mode left out of the schema uses its default
+    and is disabled if none of the note types has its fields.
+
+    Raises:
+        ValueError: If the schema is not valid.
+    """
+    import hashlib
+    if not isinstance(config, dict) or not isinstance(config.get("note_types", []), list):
+        raise ValueError("the schema must be an object with a 'note_types' list")
+    note_types = []
+    for entry in config.get("note_types") or DEFAULT_SCHEMA["note_types"]:
+        name = entry.get("name") if isinstance(entry, dict) else None
+        fields = entry.get("fields", {}) if isinstance(entry, dict) else None
+        if name is not None and not isinstance(name, str) or not isinstance(fields, dict):
+            raise ValueError("every note type needs a 'fields' object and an optional 'name'")
+        label = f"note type '{name}'" if name is not None else "the unnamed note type"
+        _schema_roles(list(fields), f"the fields of {label}")
+        if not all(value is None or isinstance(value, str) for value in fields.values()):
+            raise ValueError(f"the fields of {label} must map to field names or null")
+        note_types.append([name, [fields.get(role, role) for role in MIRROR_FIELDS]])
+    names = [name for name, _ in note_types]
+    if len(set(names)) != len(names):
+        raise ValueError("note type names must be unique, and only one note type may omit its name")
+
+    modes_config = config.get("modes", {})
+    if not isinstance(modes_config, dict) or not set(modes_config) <= set(MATCH_TYPES):
+        raise ValueError(f"'modes' must be an object with the keys {', '.join(MATCH_TYPES)}")
+    modes, queries, mirror = {}, {}, {}
+    for mode in MATCH_TYPES:
+        spec = modes_config.get(mode, DEFAULT_SCHEMA["modes"][mode])
+        if spec is None:
+            continue  # Disabled by the schema.
+        if not isinstance(spec, dict):
+            raise ValueError(f"mode '{mode}' must be an object")
+        search = _schema_roles(spec.get("search"), f"'search' of mode '{mode}'")
+        require_any = _schema_roles(spec.get("require_any", []), f"'require_any' of mode '{mode}'")
+        require_empty = _schema_roles(spec.get("require_empty", []), f"'require_empty' of mode '{mode}'")
+        if not search:
+            raise ValueError(f"mode '{mode}' must search at least one field")
+
+        clauses = []
+        for name, field_names in note_types:
+            mapped = dict(zip(MIRROR_FIELDS, field_names))
+            searched = [_search_term(f"{mapped[role]}:*{SCHEMA_TERM_SLOT}*") for role in search if mapped[role]]
+            filled = [_search_term(f"{mapped[role]}:_*") for role in require_any if mapped[role]]
+            if not searched or require_any and not filled:
+                continue  # Notes of this type can never match.
+            conditions = [_any_of(searched), *([_any_of(filled)] if filled else []),
+                          *(_search_term(f"{mapped[role]}:") for role in require_empty if mapped[role])]
+            if name is not None:
+                conditions.insert(0, _search_term(f"note:{name}"))
+            elif len(note_types) > 1:
+                # The unnamed note type stands for every note type that is not listed.
+                conditions[:0] = ["-" + _search_term(f"note:{other}") for other in names if other is not None]
+            clauses.append(" ".join(conditions))
+        if not clauses:
+            if mode in modes_config:
+                raise ValueError(f"no note type has the fields searched by mode '{mode}'")
+            continue  # A default mode the configured note types cannot serve.
+        modes[mode] = [[MIRROR_FIELDS.index(role) for role in roles] for roles in (search, require_any, require_empty)]
+        queries[mode] = _any_of([f"({clause})" for clause in clauses] if len(clauses) > 1 else clauses).split(SCHEMA_TERM_SLOT)
+
+        keys = [MIRROR_KEY_COLUMNS.get(role, f"lower({role})") for role in search]
+        if set(search) <= {"WordSource", "WordSourceInflectedForm"}:
+            scope = TRIGRAM_WORD_SCOPE
+        elif set(search) == {"SentenceSource"}:
+            scope = TRIGRAM_SENTENCE_SCOPE
+        else:
+            scope = None  # Roles outside the trigram index are scanned.
+        required = [*([_any_of([f"{role} != ''" for role in require_any])] if require_any else []),
+                    *(f"{role} = ''" for role in require_empty)]
+        mirror[mode] = [scope, _any_of([f"instr({key}, :term)" for key in keys]), " AND ".join(required)]
+    if not modes:
+        raise ValueError("the schema must enable at least one search mode")
+
+    # Notes synced into the mirror: those of a note type with the first searched field of a mode.
+    selections = []
+    for name, field_names in note_types:
+        selectors = list(dict.fromkeys(_search_term(f"{field_names[modes[mode][0][0]]}:*")
+                                       for mode in modes if field_names[modes[mode][0][0]]))
+        if selectors and name is None and len(note_types) == 1:
+            selections.extend(selectors)
+        elif selectors and name is None:
+            selections.append(f"({' OR '.join(selectors)})")
+        elif selectors:
+            selections.append(f"({_search_term(f'note:{name}')} {_any_of(selectors)})")
+    plan = {"note_types": note_types, "modes": modes, "queries": queries, "mirror": mirror,
+            "note_query": " OR ".join(selections)}
+    plan["digest"] = hashlib.sha1(json.dumps(plan, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return plan
+
+class SearchSchema:
+    """
+    A compiled schema: query templates and field extractors of the configured note types.
+
+    Field values are read by position (the role order of MIRROR_FIELDS) with the
+    field names of the item's note type; nothing is rebuilt per card. A schema
+    given as a config is compiled when it is first used, so modes that never
+    search (e.g. --browse-query) do not pay for it.
+    """
+
+    def __init__(self, plan: dict | None = None, config: dict | None = None):
+        self._config = config
+        if plan is not None:
+            self._load(plan)
+
+    # Serializes the first compile; the HTTP server and the lookup threads may all get here at once.
+    _compile_lock = threading.Lock()
+
+    def __getattr__(self, name: str):
+        # Only called for attributes that are not set yet, i.e. before the config is compiled.
+        config = self.__dict__.get("_config")
+        if config is None or name.startswith("__"):
+            raise AttributeError(name)
+        with self._compile_lock:
+            if self.__dict__.get("_config") is not None:
+                self._load(compile_schema(config))
+                self._config = None  # Only now other threads may read the attributes without the lock.
+        return getattr(self, name)
+
+    def _load(self, plan: dict):
+        self.plan = plan
+        self.digest = plan["digest"]
+        self.queries = plan["queries"]
+        self.mirror = plan["mirror"]
+        self.modes = plan["modes"]
+        self.match_types = tuple(mode for mode in MATCH_TYPES if mode in self.modes)
+        self.note_query = plan["note_query"]
+        self._by_model = {name: tuple(field_names) for name, field_names in plan["note_types"] if name is not None}
+        self._fallback = next((tuple(field_names) for name, field_names in plan["note_types"] if name is None), None)
+
+    def supports(self, search_type: str) -> bool:
+        """Whether a --search-type can be run ('all' runs the enabled modes, 'lemma' needs 'word')."""
+        return search_type == "all" or (search_type == "lemma" and "word" in self.modes) or search_type in self.modes
+
+    def field_names(self, model_name: str | None) -> tuple | None:
+        """Returns the field names of a note type in role order (None for unmapped roles), or None if it is not configured."""
+        return self._by_model.get(model_name, self._fallback)
+
+    def values(self, item: dict) -> list[str]:
+        """Reads the raw role values of a cardsInfo/notesInfo entry."""
+        names = self.field_names(item.get("modelName"))
+        fields = item.get("fields", {})
+        if names is None:
+            return [""] * len(MIRROR_FIELDS)
+        return [fields[name]["value"] if name in fields else "" for name in names]
+
+def load_schema(path: str = SCHEMA_PATH, plan_path: str = SCHEMA_PLAN_PATH) -> SearchSchema:
+    """
+    Loads the schema file, or the built-in schema if there is none.
+
+    The compiled plan is written to plan_path and reused as long as the schema
+    file keeps its size and modification time.
+
+    Raises:
+        ValueError: If the schema file is not valid.
+        OSError: If the schema file cannot be read.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return DEFAULT_SEARCH_SCHEMA
+    source = [os.path.abspath(path), stat.st_mtime_ns, stat.st_size, SCHEMA_PLAN_VERSION]
+    try:
+        with open(plan_path, "r", encoding="utf-8") as handle:
+            cached = json.load(handle)
+        if cached.get("source") == source:
+            return SearchSchema(cached["plan"])
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass  # No usable compiled plan; compile the file again.
+
+    with open(path, "r", encoding="utf-8") as handle:
+        plan = compile_schema(json.load(handle))
+    try:
+        os.makedirs(os.path.dirname(plan_path), exist_ok=True)
+        temporary = f"{plan_path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as handle:
+            json.dump({"source": source, "plan": plan}, handle, ensure_ascii=False)
+        os.replace(temporary, plan_path)
+    except OSError:
+        pass  # The plan is compiled again next time.
+    return SearchSchema(plan)
+
+# Schema of the built-in note type, and the schema used by the searches (see --schema).
+DEFAULT_SEARCH_SCHEMA = SearchSchema(config=DEFAULT_SCHEMA)
+SCHEMA = DEFAULT_SEARCH_SCHEMA
+
+class AnkiConnectError(Exception):
+    """Raised when AnkiConnect cannot be reached or reports an error."""
+
+class AnkiConnectClient:
+    """
+    Client for the AnkiConnect JSON-RPC API.
+
+    Keeps one HTTP session so connections to Anki are reused, applies separate
+    connect and read timeouts, and retries failed connection attempts a bounded
+    number of times with exponential backoff. Requests are sent with 'requests'
+    or, with transport "stdlib" (or if 'requests' is not installed), with http.client.
+
+    When Anki turns out to be unreachable (refused or timed-out connection), a
+    circuit breaker file is written. A read timeout only fails the current call:
+    Anki accepted the connection and is merely busy. Until it expires, every client (also in other
+    processes) fails immediately instead of waiting for another timeout.
+
+    Each thread gets its own session, so the client can be shared by worker threads.
+    """
+
+    def __init__(self, url: str = ANKI_CONNECT_URL, connect_timeout: float = CONNECT_TIMEOUT,
+                 read_timeout: float = READ_TIMEOUT, retries: int = RETRIES,
+                 breaker_cooldown: float = BREAKER_COOLDOWN, breaker_path: str = BREAKER_PATH,
+                 transport: str = "auto"):
+        self.url = url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.breaker_cooldown = breaker_cooldown
+        self.breaker_path = breaker_path
+        self.transport = transport
+        self._local = threading.local()
+
+    @property
+    def session(self) -> "requests.Session":
+        """The calling thread's HTTP session (transport "requests")."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = _lazy_import("requests").Session()
+        return session
+
+    def _requests(self):
+        """Returns the requests module, or None if the transport is http.client."""
+        if self.transport == "stdlib":
+            return None
+        try:
+            return _lazy_import("requests")
+        except ImportError:
+            if self.transport == "requests":
+                raise AnkiConnectError("The 'requests' transport needs the requests library (pip install requests).")
+            return None  # "auto" falls back to http.client.
+
+    def invoke(self, action: str, **params):
+        """
+        Sends a single action to AnkiConnect and returns its result.
+
+        Raises:
+            AnkiConnectError: If the request fails or AnkiConnect reports an error.
+        """
+        self._check_breaker()
+        data = json.dumps({"action": action, "version": 6, "params": params}).encode("utf-8")
+        requests = self._requests()
+        for attempt in range(self.retries + 1):
+            try:
+                if requests is not None:
+                    status, content = self._post_requests(requests, data)
+                else:
+                    status, content = self._post_stdlib(data)
+                break
+            except ConnectionError as e:
+                # A refused or timed-out connection attempt is cheap to retry.
+                if attempt == self.retries:
+                    self._open_breaker()
+                    raise AnkiConnectError(e) from e
+                time.sleep(RETRY_BACKOFF * 2 ** attempt)
+            except TimeoutError as e:
+                # Anki accepted the connection but is busy; retrying would only wait longer,
+                # and the next lookup may well be answered, so the breaker stays closed.
+                raise AnkiConnectError(e) from e
+        self._close_breaker()
+
+        with _STATS_LOCK:
+            TRANSPORT_STATS["requests"] += 1
+            TRANSPORT_STATS["bytes"] += len(content)
+        if status >= 400:
+            raise AnkiConnectError(f"HTTP {status} from {self.url}")
+        try:
+            body = json.loads(content)
+        except ValueError as e:
+            raise AnkiConnectError(e) from e
+        if body.get("error"):
+            raise AnkiConnectError(body["error"])
+        return body.get("result")
+
+    def _post_requests(self, requests, data: bytes) -> tuple[int, bytes]:
+        """
+        Sends a request body with the thread's requests session.
+
+        Raises:
+            ConnectionError: If no connection could be established.
+            TimeoutError: If Anki did not answer within the read timeout.
+            AnkiConnectError: On any other failure.
+        """
+        try:
+            response = self.session.post(self.url, data=data, headers={"Content-Type": "application/json"},
+                                         timeout=(self.connect_timeout, self.read_timeout))
+        except requests.exceptions.ConnectionError as e:
+            raise ConnectionError(e) from e
+        except requests.exceptions.Timeout as e:
+            raise TimeoutError(e) from e
+        except requests.exceptions.RequestException as e:
+            raise AnkiConnectError(e) from e
+        return response.status_code, response.content
+
+    def _post_stdlib(self, data: bytes) -> tuple[int, bytes]:
+        """
+        Sends a request body over the thread's http.client connection.
+
+        The connection is kept open between requests. If a kept connection turns out
+        to be closed by Anki, the request is sent once more on a new connection.
+
+        Raises:
+            ConnectionError: If no connection could be established.
+            TimeoutError: If Anki did not answer within the read timeout.
+        """
+        http_client = _lazy_import("http.client")
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.connection_url != self.url:
+            if connection is not None:
+                connection.close()
+            from urllib.parse import urlsplit
+            url = urlsplit(self.url)
+            factory = http_client.HTTPSConnection if url.scheme == "https" else http_client.HTTPConnection
+            connection = self._local.connection = factory(url.hostname, url.port, timeout=self.connect_timeout)
+            self._local.connection_url = self.url
+            self._local.path = (url.path or "/") + (f"?{url.query}" if url.query else "")
+
+        reused = connection.sock is not None
+        if not reused:
+            try:
+                connection.connect()
+            except OSError as e:  # Refused, unresolvable or timed out.
+                connection.close()
+                raise ConnectionError(e) from e
+        connection.sock.settimeout(self.read_timeout)
+        try:
+            connection.request("POST", self._local.path, body=data, headers={"Content-Type": "application/json"})
+            response = connection.getresponse()
+            content = response.read()
+        except TimeoutError:
+            connection.close()
+            raise
+        except (http_client.HTTPException, OSError) as e:
+            connection.close()
+            if reused:
+                return self._post_stdlib(data)  # Anki closed the idle connection.
+            raise ConnectionError(e) from e
+        if response.will_close:
+            connection.close()
+        return response.status, content
+
+    def _check_breaker(self):
+        try:
+            with open(self.breaker_path, encoding="utf-8") as handle:
+                state = json.load(handle)
+            retry_at = float(state["retry_at"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return  # No breaker file: Anki was reachable last time.
+        if state.get("url") == self.url and time.time() < retry_at:
+            raise AnkiConnectError(f"Anki is not reachable at {self.url} (retrying in {retry_at - time.time():.1f} s).")
+
+    def _open_breaker(self):
+        if self.breaker_cooldown <= 0:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.breaker_path), exist_ok=True)
+            with open(self.breaker_path, "w", encoding="utf-8") as handle:
+                json.dump({"url": self.url, "retry_at": time.time() + self.breaker_cooldown}, handle)
+        except OSError:
+            pass
+
+    def _close_breaker(self):
+        if os.path.exists(self.breaker_path):
+            with contextlib.suppress(OSError):
+                os.remove(self.breaker_path)
+
+# Client shared by every AnkiConnect call of this process (see _configure_client()).
+ANKI_CLIENT = AnkiConnectClient()
+
+def _anki_invoke(action: str, **params):
+    """Sends a single action through the shared AnkiConnect client."""
+    with PROFILER.span(f"anki:{action}"):
+        return ANKI_CLIENT.invoke(action, **params)
+
+_EXECUTOR = None
+
+def _executor() -> "ThreadPoolExecutor":
+    """
+    Returns the worker pool for concurrent AnkiConnect requests.
+
+    The pool lives as long as the process, so in daemon mode its threads keep
+    their HTTP sessions (and connections) between lookups.
+    """
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _EXECUTOR = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="anki-connect")
+    return _EXECUTOR
 
 def open_in_anki_browser(query: str):
     """
@@ -29,23 +729,219 @@ def open_in_anki_browser(query: str):
     Args:
         query (str): The search query string to execute in the Anki browser.
     """
-    anki_connect_url = "http://localhost:8765"
-    # Construct the JSON-RPC payload for the 'guiBrowse' action.
-    payload = {
-        "action": "guiBrowse",
-        "version": 6,
-        "params": {
-            "query": query
-        }
-    }
     try:
-        response = requests.post(anki_connect_url, json=payload)
-        response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx).
+        _anki_invoke("guiBrowse", query=query)
         print(f"Successfully sent query to Anki Browser: {query}")
-    except requests.exceptions.RequestException as e:
+    except AnkiConnectError as e:
         print(f"Error sending command to AnkiConnect: {e}")
 
-def search_word_in_decks(search_word: str, search_type: str, html_output: bool = False) -> list[dict] | None:
+def _browse_log() -> "logging.Logger":
+    """Returns the logger of fire-and-forget browsing, writing to BROWSE_LOG_PATH."""
+    import logging
+    logger = logging.getLogger("anki-search.browse")
+    if not logger.handlers:
+        os.makedirs(APP_DIR, exist_ok=True)
+        handler = logging.FileHandler(BROWSE_LOG_PATH, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+def _read_browse_spool() -> dict | None:
+    try:
+        with open(BROWSE_SPOOL_PATH, encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+def _browse_worker_alive() -> bool:
+    try:
+        return time.time() - os.path.getmtime(BROWSE_WORKER_PATH) < BROWSE_HEARTBEAT_TIMEOUT
+    except OSError:
+        return False
+
+def _write_browse_heartbeat():
+    with open(BROWSE_WORKER_PATH, "w", encoding="utf-8") as handle:
+        handle.write(str(os.getpid()))  # Callers do not start another worker.
+
+def _keep_browse_heartbeat(done: threading.Event):
+    """Refreshes the worker's heartbeat until done is set (runs in a side thread during a guiBrowse call)."""
+    while not done.wait(BROWSE_HEARTBEAT_INTERVAL):
+        with contextlib.suppress(OSError):
+            _write_browse_heartbeat()
+
+def queue_browse(query: str, args: argparse.Namespace):
+    """
+    Hands a browse query to the background worker and returns immediately.
+
+    The query replaces any query that is still waiting in the spool file, so a
+    burst of lookups only opens the last one. If no worker is running, one is
+    started as a detached process with the connection arguments of this call.
+
+    Args:
+        query (str): The search query to open in the Anki browser.
+        args (argparse.Namespace): Arguments passed on to the worker.
+    """
+    os.makedirs(APP_DIR, exist_ok=True)
+    waiting = _read_browse_spool()
+    entry = {"query": query, "queued_at": time.time(), "count": (waiting or {}).get("count", 0) + 1,
+             "anki_url": args.anki_url}
+    temporary = f"{BROWSE_SPOOL_PATH}.{os.getpid()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as handle:
+        json.dump(entry, handle, ensure_ascii=False)
+    os.replace(temporary, BROWSE_SPOOL_PATH)  # Readers see either the old or the new query.
+    _browse_log().info(f"Queued query for Anki Browser: '{query}'")
+
+    if not _browse_worker_alive():
+        _spawn_detached(["--browse-worker",
+                         "--debounce", str(args.debounce if args.debounce is not None else BROWSE_DEBOUNCE),
+                         "--anki-url", args.anki_url, "--connect-timeout", str(args.connect_timeout),
+                         "--read-timeout", str(args.read_timeout), "--retries", str(args.retries)])
+    print(f"Queued query for Anki Browser: {query}")
+
+def _spawn_detached(arguments: list[str], stdin_text: str | None = None):
+    """
+    Starts this script with the given arguments as a detached background process.
+
+    Args:
+        arguments (list[str]): Command-line arguments of the process.
+        stdin_text (str | None): Text written to the process's standard input; without
+            it, the process reads nothing from standard input.
+    """
+    import subprocess
+    if os.name == "nt":
+        detach = {"creationflags": subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        detach = {"start_new_session": True}
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), *arguments],
+                               stdin=subprocess.DEVNULL if stdin_text is None else subprocess.PIPE,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, close_fds=True,
+                               env={**os.environ, "PYTHONIOENCODING": "utf-8"}, **detach)
+    if stdin_text is not None:
+        with process.stdin:
+            process.stdin.write(stdin_text.encode("utf-8"))
+
+def run_browse_worker(debounce: float = BROWSE_DEBOUNCE, idle_timeout: float = BROWSE_WORKER_IDLE):
+    """
+    Sends the queries queued by queue_browse() to the Anki browser.
+
+    A queued query is sent once no newer query has arrived for the debounce interval;
+    queries it replaced are counted in the log. The outcome of every guiBrowse call is
+    logged. The worker exits after idle_timeout seconds without queued queries.
+    """
+    log = _browse_log()
+    idle_since = time.monotonic()
+    while True:
+        _write_browse_heartbeat()
+        entry = _read_browse_spool()
+        if entry is None:
+            if time.monotonic() - idle_since < idle_timeout:
+                time.sleep(BROWSE_POLL_INTERVAL)
+                continue
+            with contextlib.suppress(OSError):
+                os.remove(BROWSE_WORKER_PATH)
+            if _read_browse_spool() is None:
+                return
+            continue  # A query arrived while the worker was shutting down.
+        wait = entry.get("queued_at", 0) + debounce - time.time()
+        if wait > 0:
+            time.sleep(min(wait, BROWSE_POLL_INTERVAL))
+            continue
+
+        taken = f"{BROWSE_SPOOL_PATH}.{os.getpid()}.taken"
+        try:
+            os.replace(BROWSE_SPOOL_PATH, taken)
+        except OSError:
+            continue  # Taken by another worker.
+        with contextlib.suppress(OSError):
+            with open(taken, encoding="utf-8") as handle:
+                entry = json.load(handle)
+            os.remove(taken)
+        query = entry.get("query", "")
+        ANKI_CLIENT.url = entry.get("anki_url", ANKI_CLIENT.url)  # A running worker serves every caller.
+        if entry.get("count", 1) > 1:
+            log.info(f"Coalesced {entry['count']} queued queries; sending only the latest.")
+        log.info(f"Attempting to open Anki Browser with query: '{query}'")
+        started = time.perf_counter()
+        done = threading.Event()
+        heartbeat = threading.Thread(target=_keep_browse_heartbeat, args=(done,), daemon=True)
+        heartbeat.start()
+        try:
+            _anki_invoke("guiBrowse", query=query)
+            log.info(f"Successfully sent query to Anki Browser ({time.perf_counter() - started:.2f} s).")
+        except AnkiConnectError as e:
+            log.error(f"Error sending command to AnkiConnect: {e}")
+        finally:
+            done.set()
+            heartbeat.join()
+        idle_since = time.monotonic()
+
+def watch_clipboard(poll_interval: float = WATCH_POLL_INTERVAL, debounce: float = WATCH_DEBOUNCE,
+                    history_size: int = WATCH_HISTORY_SIZE, duplicate_window: float = WATCH_DUPLICATE_WINDOW):
+    """
+    Watches the clipboard and opens every newly copied text in the Anki browser.
+
+    Replaces spawning 'anki-search.py --browse-clipboard' per hotkey: the process stays
+    running, so a lookup costs one guiBrowse request over the already open connection.
+    A change is only sent once the clipboard has stayed the same for the debounce
+    interval; junk (see _is_junk_query()) and queries sent again within the duplicate
+    window are ignored. Runs until interrupted with Ctrl+C.
+
+    Args:
+        poll_interval (float): Seconds between clipboard reads.
+        debounce (float): Seconds the clipboard must stay unchanged before it is sent.
+        history_size (int): Number of sent queries remembered for duplicate detection.
+        duplicate_window (float): Seconds during which a repeated query is ignored.
+    """
+    pyperclip = _lazy_import("pyperclip")
+    history = collections.deque(maxlen=history_size)  # (query, sent_at) pairs
+    try:
+        last_seen = pyperclip.paste()  # Content copied before watching started is not sent.
+    except pyperclip.PyperclipException as e:
+        print(f"Error reading the clipboard: {e}")
+        return
+    pending, changed_at = None, 0.0
+    print("Watching the clipboard (press Ctrl+C to stop).", flush=True)
+    try:
+        while True:
+            time.sleep(poll_interval)
+            try:
+                content = pyperclip.paste()
+            except pyperclip.PyperclipException as e:
+                print(f"Error reading the clipboard: {e}", flush=True)
+                continue
+            now = time.monotonic()
+            if content != last_seen:
+                last_seen, pending, changed_at = content, content, now
+                continue
+            if pending is None or now - changed_at < debounce:
+                continue
+
+            query, pending = pending.strip(), None
+            if _is_junk_query(query):
+                print(f"Ignored clipboard content: {query[:60]!r}", flush=True)
+            elif any(sent == query and now - sent_at < duplicate_window for sent, sent_at in history):
+                pass  # The same text was copied again right away.
+            else:
+                open_in_anki_browser(query)
+                history.append((query, now))
+                sys.stdout.flush()
+    except KeyboardInterrupt:
+        print(f"Stopped watching the clipboard after {len(history)} recent lookups.")
+
+def _is_junk_query(text: str) -> bool:
+    """Tells whether clipboard content is clearly not meant as a search query."""
+    if not text or len(text) > WATCH_MAX_QUERY_LENGTH or text.count("\n") >= WATCH_MAX_QUERY_LINES:
+        return True
+    # Command-line options such as an accidentally copied '--browse-clipboard'.
+    if text.startswith("--"):
+        return True
+    return any(ord(char) < 32 and char not in "\t\r\n" for char in text)
+
+def search_word_in_decks(search_word: str, search_type: str, html_output: bool = False,
+                         retrieval: str = "cards", limit: int | None = None,
+                         page_size: int = PAGE_SIZE, rank: bool = False, top: int | None = None) -> list[Card] | None:
     """
     Searches for cards based on a word or sentence and returns their data.
 
@@ -54,157 +950,2038 @@ def search_word_in_decks(search_word: str, search_type: str, html_output: bool =
         search_type (str): The type of search, either 'word' or 'sentence'.
         html_output (bool): If True, field values are returned with HTML tags.
                             If False, HTML tags are stripped.
+        retrieval (str): 'cards' fetches every matching card with cardsInfo;
+                         'notes' fetches each matching note once with notesInfo,
+                         so sibling cards of the same note are not repeated.
+        limit (int | None): Maximum number of results; retrieval stops once it is reached.
+        page_size (int): Number of IDs fetched per cardsInfo/notesInfo request.
+        rank (bool): If True, order the results with rank_items() instead of the
+                     order of findCards/findNotes.
+        top (int | None): With rank, keep only the best top results.
 
     Returns:
-        A list of dictionaries, where each dictionary represents a card's data,
+        A list of Card records, one per matching card (or note),
         or None if no cards are found or an error occurs.
     """
-    anki_connect_url = "http://localhost:8765"
+    try:
+        card_data = list(itertools.islice(
+            iter_search_results(search_word, search_type, html_output, retrieval, page_size, rank, top), limit))
+    except AnkiConnectError as e:
+        print(f"Error connecting to AnkiConnect: {e}")
+        return None
+    return card_data or None
+
+def iter_search_results(search_word: str, search_type: str, html_output: bool = False,
+                        retrieval: str = "cards", page_size: int = PAGE_SIZE,
+                        rank: bool = False, top: int | None = None):
+    """
+    Streams the results of search_word_in_decks() page by page.
+
+    Only the matching IDs are fetched up front; card (or note) details are then
+    requested in pages of page_size IDs, and each page is parsed and yielded before
+    the next one is requested. A consumer that stops early (e.g. itertools.islice)
+    therefore never fetches the remaining pages.
+
+    With rank, every page has to be fetched before the first result is known; the
+    raw pages go through rank_items() and only the results it keeps are parsed.
+
+    Yields:
+        Card records in the order returned by findCards/findNotes, or in rank order.
+
+    Raises:
+        AnkiConnectError: If AnkiConnect cannot be reached.
+        ValueError: If search_type or retrieval is invalid.
+    """
+    query = build_search_query(search_word, search_type)
+    if retrieval == "cards":
+        # Step 1: Find the IDs of cards matching the query.
+        item_ids = _anki_invoke("findCards", query=query) or []
+    elif retrieval == "notes":
+        item_ids = _anki_invoke("findNotes", query=query) or []
+    else:
+        raise ValueError("Invalid retrieval. Must be 'cards' or 'notes'.")
+
+    # Step 2: Retrieve detailed information one page of IDs at a time.
+    def pages():
+        for start in range(0, len(item_ids), max(1, page_size)):
+            page = item_ids[start:start + max(1, page_size)]
+            if retrieval == "notes":
+                projected = _fetch_note_projections(page)
+                yield [projected[note_id] for note_id in page if note_id in projected]
+            else:
+                yield _anki_invoke("cardsInfo", cards=page) or []
+
+    # Step 3: Parse and format the card data.
+    if rank:
+        yield from _parse_cards(rank_items(itertools.chain.from_iterable(pages()), search_word, top), html_output)
+        return
+    for items in pages():
+        yield from _parse_cards(items, html_output)
+
+def _fetch_note_projections(note_ids: list[int]) -> dict[int, dict]:
+    """
+    Fetches notes with notesInfo and projects them onto the cardsInfo shape.
+
+    notesInfo does not render card templates, and only the fields the formatter
+    uses are kept from its answer. The deck name is taken from each note's first
+    card with a single getDecks call.
+
+    Returns:
+        A mapping of note ID to a {"note": ..., "fields": ..., "deckName": ...}
+        dictionary that _parse_cards() and rank_items() accept.
+
+    Raises:
+        AnkiConnectError: If AnkiConnect cannot be reached.
+    """
+    notes = [note for note in _anki_invoke("notesInfo", notes=note_ids) or [] if note.get("cards")]
+    decks = {}
+    if notes:
+        for deck_name, card_ids in (_anki_invoke("getDecks", cards=[note["cards"][0] for note in notes]) or {}).items():
+            decks.update(dict.fromkeys(card_ids, deck_name))
+
+    projected = {}
+    for note in notes:
+        fields = note.get("fields", {})
+        projected[note["noteId"]] = {
+            "note": note["noteId"],
+            "modelName": note.get("modelName"),
+            "fields": {name: fields[name] for name in SCHEMA.field_names(note.get("modelName")) or () if name in fields},
+            "deckName": decks.get(note["cards"][0], ""),
+        }
+    return projected
+
+def compare_retrieval(search_word: str, search_type: str) -> list[tuple[str, int, int, int, float]]:
+    """
+    Runs the same search with card- and note-level retrieval and measures both.
+
+    Returns:
+        One tuple per mode: (mode, requests, response bytes, results, seconds).
+    """
+    measurements = []
+    for mode in ("cards", "notes"):
+        before = dict(TRANSPORT_STATS)
+        started = time.perf_counter()
+        result = search_word_in_decks(search_word, search_type, retrieval=mode)
+        elapsed = time.perf_counter() - started
+        measurements.append((mode, TRANSPORT_STATS["requests"] - before["requests"],
+                             TRANSPORT_STATS["bytes"] - before["bytes"], len(result or []), elapsed))
+    return measurements
+
+def search_all(search_word: str, html_output: bool = False, retrieval: str = "cards",
+               page_size: int = PAGE_SIZE, limit: int | None = None,
+               rank: bool = False, top: int | None = None) -> dict[str, list[Card]]:
+    """
+    Runs the word and sentence searches at the same time and groups the results.
+
+    Both findCards (or findNotes) queries are sent concurrently. The IDs are merged,
+    so a card matching both searches is fetched once and listed under 'word', and
+    the details are then fetched in pages of page_size IDs in parallel. The total
+    latency is close to that of the slowest request instead of the sum of all.
+
+    Args:
+        search_word (str): The term to search for.
+        html_output (bool): If True, field values are returned with HTML tags.
+        retrieval (str): 'cards' or 'notes', as in search_word_in_decks().
+        page_size (int): Number of IDs fetched per cardsInfo/notesInfo request.
+        limit (int | None): Maximum number of results per match type.
+        rank (bool): If True, order each match type with rank_items().
+        top (int | None): With rank, keep only the best top results per match type.
+
+    Returns:
+        A dictionary mapping each match type ('word', 'sentence') to its Card records.
+
+    Raises:
+        AnkiConnectError: If AnkiConnect cannot be reached.
+    """
+    if retrieval not in ("cards", "notes"):
+        raise ValueError("Invalid retrieval. Must be 'cards' or 'notes'.")
+    find_action = "findNotes" if retrieval == "notes" else "findCards"
+    pool = _executor()
+
+    # Step 1: Find the IDs for both match types concurrently.
+    futures = {match_type: pool.submit(_anki_invoke, find_action, query=build_search_query(search_word, match_type))
+               for match_type in SCHEMA.match_types}
+    grouped_ids = {}
+    seen = set()
+    for match_type in SCHEMA.match_types:
+        item_ids = [item_id for item_id in futures[match_type].result() or [] if item_id not in seen]
+        grouped_ids[match_type] = item_ids[:limit]
+        seen.update(grouped_ids[match_type])
 
-    # Construct a complex query based on the search type.
-    # This query looks for the search term in specific source fields and ensures
-    # that corresponding destination fields are not empty.
-    if search_type == "word":
-        query = f'("WordSource:*{search_word}*" OR "WordSourceInflectedForm:*{search_word}*") (WordDestination:_* OR SentenceDestination:_* OR WordSourceMorphologyAI:_*)'
-    elif search_type == "sentence":
-        query = f'"SentenceSource:*{search_word}*" SentenceDestination:_* WordSource:'
+    # Step 2: Retrieve the details of all IDs in parallel pages.
+    unique_ids = [item_id for item_ids in grouped_ids.values() for item_id in item_ids]
+    page_size = max(1, page_size)
+    pages = [unique_ids[start:start + page_size] for start in range(0, len(unique_ids), page_size)]
+    if retrieval == "notes":
+        fetch = _fetch_note_projections
     else:
+        def fetch(page: list[int]) -> dict[int, dict]:
+            return {card.get("cardId"): card for card in _anki_invoke("cardsInfo", cards=page) or []}
+    infos = {}
+    for page_infos in pool.map(fetch, pages):
+        infos.update(page_infos)
+
+    # Step 3: Parse and format the card data per match type.
+    groups = {}
+    for match_type, item_ids in grouped_ids.items():
+        items = [infos[item_id] for item_id in item_ids if item_id in infos]
+        if rank:
+            items = rank_items(items, search_word, top)
+        groups[match_type] = _parse_cards(items, html_output)
+    return groups
+
+def build_search_query(search_word: str, search_type: str) -> str:
+    """
+    Builds the Anki search query for a word or sentence lookup.
+
+    The query looks for the search term in the source fields of the search mode
+    and ensures that the corresponding destination fields are not empty; both
+    come from the compiled template of the schema (see compile_schema()).
+
+    Raises:
+        ValueError: If search_type is not 'word' or 'sentence'.
+    """
+    parts = SCHEMA.queries.get(search_type)
+    if parts is None:
         raise ValueError("Invalid search_type. Must be 'word' or 'sentence'.")
+    return search_word.join(parts)
+
+def rank_items(items, search_word: str, top: int | None = None, fields=None) -> list:
+    """
+    Orders raw search results from the best to the weakest match.
+
+    Matches are ranked by tier: the term is the WordSource itself (0), one of the
+    listed inflected forms (1), a whole word in WordSource, the inflected forms or
+    SentenceSource (2), or only part of a word (3). Terms and field values are
+    compared in the folded form of the lemma index (see normalize_form()). Within
+    a tier, newer notes (higher note IDs) come first; ties keep their input order.
+
+    Only the three searched fields are looked at, so the remaining fields of the
+    results that are dropped are never stripped or formatted.
+
+    Args:
+        items (Iterable): cardsInfo entries or dictionaries of the same shape.
+        search_word (str): The term that was searched for.
+        top (int | None): If set, keep only the best top items. They are selected
+                          with a heap of that size, so the whole result is never sorted.
+        fields (callable | None): Maps an item to (WordSource, WordSourceInflectedForm,
+                                  SentenceSource, note ID); reads cardsInfo items by default.
+
+    Returns:
+        The kept items, best match first.
+    """
+    import heapq
+    if fields is None:
+        fields = _item_rank_fields
+
+    term = normalize_form(search_word)
+    boundary = re.compile(rf"(?<!\w){re.escape(term)}(?!\w)")
+
+    def key(item):
+        word_source, inflected, sentence, note_id = fields(item)
+        if term in surface_forms(word_source):
+            tier = 0
+        elif term in surface_forms(inflected):
+            tier = 1
+        elif any(boundary.search(normalize_form(_strip_html(value)))
+                 for value in (word_source, inflected, sentence) if value):
+            tier = 2
+        else:
+            tier = 3
+        return tier, -(note_id or 0)
+
+    if top is None:
+        return sorted(items, key=key)
+    return heapq.nsmallest(max(0, top), items, key=key)
+
+# Positions of the roles compared by rank_items().
+RANK_POSITIONS = tuple(MIRROR_FIELDS.index(name) for name in ("WordSource", "WordSourceInflectedForm", "SentenceSource"))
+
+def _item_rank_fields(item: dict) -> tuple:
+    """rank_items() fields of a cardsInfo entry or note projection."""
+    values = SCHEMA.values(item)
+    return (*(values[position] for position in RANK_POSITIONS), item.get("note", 0))
+
+def _row_rank_fields(row: tuple) -> tuple:
+    """rank_items() fields of a result row (role values, deck name, note ID)."""
+    return (*(row[position] for position in RANK_POSITIONS), row[-1])
+
+def _parse_cards(cards: list[dict], html_output: bool) -> list[Card]:
+    """Converts cardsInfo entries into the Card records printed by the script."""
+    card_data = []
+    with PROFILER.span("strip_html"):
+        cards = list(cards)
+        rows = [SCHEMA.values(card) for card in cards]
+        if not html_output:
+            rows = FIELD_CLEANER.clean_rows(rows)
+        for row, card in zip(rows, cards):
+            card_data.append(Card(*row, card.get("deckName", "")))
+    return card_data
+
+def _parse_rows(rows: list[tuple], html_output: bool) -> list[Card]:
+    """Converts result rows (role values, deck name, note ID) into Card records."""
+    card_data = []
+    with PROFILER.span("strip_html"):
+        values = [row[:len(MIRROR_FIELDS)] for row in rows]
+        if not html_output:
+            values = FIELD_CLEANER.clean_rows(values)
+        for row, row_values in zip(rows, values):
+            card_data.append(Card(*row_values, row[-2]))
+    return card_data
+
+def search_words_batch(search_words: list[str], search_type: str, html_output: bool = False,
+                       batch_size: int = 50, retrieval: str = "cards", rank: bool = False, top: int | None = None,
+                       page_size: int = PAGE_SIZE):
+    """
+    Looks up many terms with a few AnkiConnect round trips.
+
+    The findCards (or findNotes) queries of each batch are packed into a single
+    'multi' request, and the union of the found IDs is fetched with cardsInfo
+    (or notesInfo) in pages of page_size IDs, requested in parallel like in
+    search_all(), so common words do not turn into one huge answer.
+
+    Args:
+        search_words (list[str]): The terms to search for.
+        search_type (str): The type of search, either 'word' or 'sentence'.
+        html_output (bool): If True, field values are returned with HTML tags.
+        batch_size (int): Number of terms sent per 'multi' request.
+        retrieval (str): 'cards' or 'notes', as in search_word_in_decks().
+        rank (bool): If True, order each term's results with rank_items().
+        top (int | None): With rank, keep only the best top results per term.
+        page_size (int): Number of IDs per cardsInfo/notesInfo request.
+
+    Yields:
+        Tuples of (term, cards) in input order, where cards is a list of card
+        dictionaries or None if nothing was found.
+
+    Raises:
+        AnkiConnectError: If AnkiConnect cannot be reached.
+    """
+    for start in range(0, len(search_words), batch_size):
+        batch = search_words[start:start + batch_size]
+        find_action = "findNotes" if retrieval == "notes" else "findCards"
+        actions = [{"action": find_action, "params": {"query": build_search_query(word, search_type)}}
+                   for word in batch]
+        found = [_multi_result(entry) or [] for entry in _anki_invoke("multi", actions=actions)]
+
+        unique_ids = list(dict.fromkeys(item_id for item_ids in found for item_id in item_ids))
+        pages = [unique_ids[page:page + max(1, page_size)] for page in range(0, len(unique_ids), max(1, page_size))]
+        if retrieval == "notes":
+            fetch = _fetch_note_projections
+        else:
+            def fetch(page: list[int]) -> dict[int, dict]:
+                return {card.get("cardId"): card for card in _anki_invoke("cardsInfo", cards=page) or []}
+        infos = {}
+        for page_infos in _executor().map(fetch, pages):
+            infos.update(page_infos)
+
+        for word, item_ids in zip(batch, found):
+            items = [infos[item_id] for item_id in item_ids if item_id in infos]
+            if rank:
+                items = rank_items(items, word, top)
+            yield word, (_parse_cards(items, html_output) or None)
+
+def _multi_result(entry):
+    """Unwraps one entry of a 'multi' response, which may carry its own error."""
+    if isinstance(entry, dict) and ("result" in entry or "error" in entry):
+        if entry.get("error"):
+            raise AnkiConnectError(entry["error"])
+        return entry.get("result")
+    return entry
+
+def _open_mirror(path: str = MIRROR_PATH) -> "sqlite3.Connection":
+    """Opens (and if necessary creates) the local mirror database."""
+    import sqlite3
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    field_columns = ", ".join(f'"{name}" TEXT NOT NULL DEFAULT \'\'' for name in MIRROR_FIELDS)
+    conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS notes (
+            note_id INTEGER PRIMARY KEY,
+            mod INTEGER NOT NULL,
+            deck_name TEXT NOT NULL DEFAULT '',
+            {field_columns},
+            word_key TEXT NOT NULL DEFAULT '',
+            inflected_key TEXT NOT NULL DEFAULT '',
+            sentence_key TEXT NOT NULL DEFAULT ''
+        );
+        CREATE TABLE IF NOT EXISTS trigrams (
+            scope INTEGER NOT NULL,
+            gram TEXT NOT NULL,
+            note_id INTEGER NOT NULL,
+            PRIMARY KEY (scope, gram, note_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS trigrams_by_note ON trigrams (note_id);
+        CREATE TABLE IF NOT EXISTS forms (
+            form TEXT NOT NULL,
+            note_id INTEGER NOT NULL,
+            PRIMARY KEY (form, note_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS forms_by_note ON forms (note_id);
+    """)
+    if _mirror_meta(conn, "trigram_index") is None:
+        # Mirrors created before the index existed are indexed once here.
+        with conn:
+            rows = conn.execute("SELECT note_id, word_key, inflected_key, sentence_key FROM notes").fetchall()
+            _index_trigrams(conn, rows)
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('trigram_index', '1')")
+    if _mirror_meta(conn, "lemma_index") is None:
+        with conn:
+            rows = conn.execute("SELECT note_id, WordSource, WordSourceInflectedForm FROM notes").fetchall()
+            _index_forms(conn, rows)
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('lemma_index', '1')")
+    if "first_card" not in {row[1] for row in conn.execute("PRAGMA table_info(notes)")}:
+        # Mirrors created before deck moves were tracked get the column once; sync_mirror()
+        # fetches their notes again to fill it.
+        with conn:
+            conn.execute("ALTER TABLE notes ADD COLUMN first_card INTEGER")
+    return conn
+
+def _trigrams(text: str) -> set[str]:
+    """Returns the set of three-character substrings of a search key."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def _index_trigrams(conn: "sqlite3.Connection", rows: list[tuple[int, str, str, str]]):
+    """
+    Replaces the trigram postings of the given notes.
+
+    Args:
+        rows: Tuples of (note_id, word_key, inflected_key, sentence_key).
+    """
+    conn.executemany("DELETE FROM trigrams WHERE note_id = ?", ((row[0],) for row in rows))
+    postings = []
+    for note_id, word_key, inflected_key, sentence_key in rows:
+        postings.extend((TRIGRAM_WORD_SCOPE, gram, note_id) for gram in _trigrams(word_key) | _trigrams(inflected_key))
+        postings.extend((TRIGRAM_SENTENCE_SCOPE, gram, note_id) for gram in _trigrams(sentence_key))
+    conn.executemany("INSERT OR IGNORE INTO trigrams VALUES (?, ?, ?)", postings)
+
+def normalize_form(text: str) -> str:
+    """
+    Folds a word form to the key used by the lemma index.
+
+    Case is folded, umlauts and ß are written out (ä -> ae, ö -> oe, ü -> ue, ß -> ss)
+    and other diacritics are dropped, so "Müller", "MUELLER" and "muller" differ
+    only where the spelling really differs.
+    """
+    import html
+    import unicodedata
+    text = unicodedata.normalize("NFC", html.unescape(text)).casefold().translate(LEMMA_FOLDS)
+    text = "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char))
+    return " ".join(text.split()).strip(".!?¡¿'\"*-–—")
+
+def surface_forms(*values: str) -> set[str]:
+    """
+    Returns the normalized surface forms listed in raw field values.
+
+    Inflection lists are split at commas, semicolons, slashes, brackets and line
+    breaks. A multi-word form ("ist gegangen") is indexed as a whole and, in
+    addition, by each of its words except articles, pronouns and auxiliaries.
+    """
+    forms = set()
+    for value in values:
+        for part in LEMMA_SEPARATORS.split(value):
+            form = normalize_form(_strip_html(part))
+            if not form:
+                continue
+            forms.add(form)
+            words = form.split()
+            if len(words) > 1:
+                forms.update(word for word in words if word not in LEMMA_STOPWORDS)
+    return forms
+
+def _index_forms(conn: "sqlite3.Connection", rows: list[tuple[int, str, str]]):
+    """
+    Replaces the lemma index entries of the given notes.
+
+    Args:
+        rows: Tuples of (note_id, WordSource, WordSourceInflectedForm) with raw field values.
+    """
+    conn.executemany("DELETE FROM forms WHERE note_id = ?", ((row[0],) for row in rows))
+    conn.executemany("INSERT OR IGNORE INTO forms VALUES (?, ?)",
+                     ((form, note_id) for note_id, *values in rows for form in surface_forms(*values)))
+
+def _mirror_meta(conn: "sqlite3.Connection", key: str) -> str | None:
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def _upsert_notes(conn: "sqlite3.Connection", notes: list[dict], decks: dict[int, str]):
+    """Writes notesInfo entries into the mirror, replacing older versions."""
+    columns = ["note_id", "mod", "deck_name", "first_card", *MIRROR_FIELDS, "word_key", "inflected_key", "sentence_key"]
+    placeholders = ", ".join("?" * len(columns))
+    quoted = ", ".join(f'"{name}"' for name in columns)
+    key_positions = [MIRROR_FIELDS.index(name) for name in MIRROR_KEY_COLUMNS]
+    rows = []
+    for note in notes:
+        values = SCHEMA.values(note)
+        cards = note.get("cards") or [None]
+        rows.append([
+            note["noteId"], note.get("mod", 0), decks.get(cards[0], ""), cards[0], *values,
+            # Search keys are lowercased copies of the raw fields, matched with instr().
+            *(values[position].lower() for position in key_positions),
+        ])
+    conn.executemany(f"INSERT OR REPLACE INTO notes ({quoted}) VALUES ({placeholders})", rows)
+    _index_trigrams(conn, [(row[0], *row[-3:]) for row in rows])
+    word_source = 4 + MIRROR_FIELDS.index("WordSource")
+    inflected = 4 + MIRROR_FIELDS.index("WordSourceInflectedForm")
+    _index_forms(conn, [(row[0], row[word_source], row[inflected]) for row in rows])
+
+def sync_mirror(full: bool = False, path: str = MIRROR_PATH) -> tuple[int, int]:
+    """
+    Brings the local mirror up to date with the Anki collection.
+
+    An incremental sync only fetches notes edited since the previous sync
+    (findNotes "edited:N" + notesInfo); a full sync fetches every matching note.
+    Notes deleted from the collection are removed in both cases. A mirror built
+    with another schema (see --schema) is always synced in full.
+
+    Moving cards to another deck does not change the note, so "edited:N" misses it.
+    If the number of cards in any deck changed since the previous sync (see
+    _deck_summary()), the deck of every other note is looked up again with getDecks.
+
+    Args:
+        full (bool): If True, re-download every note instead of only edited ones.
+        path (str): Location of the mirror database.
+
+    Returns:
+        A tuple (updated, deleted) with the number of affected notes.
+
+    Raises:
+        AnkiConnectError: If AnkiConnect cannot be reached.
+    """
+    conn = _open_mirror(path)
+    with conn:
+        started = time.time()
+        last_sync = _mirror_meta(conn, "last_sync")
+        deck_summary = _deck_summary()
+        all_ids = _anki_invoke("findNotes", query=SCHEMA.note_query) or []
+        incremental = not (full or last_sync is None or _mirror_schema(conn) != SCHEMA.digest)
+        if not incremental:
+            changed_ids = all_ids
+        else:
+            # "edited:N" works in whole days, so round up and add a day of margin.
+            days = math.ceil((started - float(last_sync)) / 86400) + 1
+            changed_ids = _anki_invoke("findNotes", query=f"({SCHEMA.note_query}) edited:{days}") or []
+            # Notes stored before first_card existed are fetched again once.
+            unknown = [note_id for (note_id,) in conn.execute("SELECT note_id FROM notes WHERE first_card IS NULL")]
+            changed_ids = list(dict.fromkeys(changed_ids + unknown))
+
+        for start in range(0, len(changed_ids), MIRROR_CHUNK_SIZE):
+            notes = _anki_invoke("notesInfo", notes=changed_ids[start:start + MIRROR_CHUNK_SIZE]) or []
+            notes = [note for note in notes if note.get("noteId")]
+            first_cards = [note["cards"][0] for note in notes if note.get("cards")]
+            decks = {}
+            if first_cards:
+                for deck_name, card_ids in (_anki_invoke("getDecks", cards=first_cards) or {}).items():
+                    decks.update(dict.fromkeys(card_ids, deck_name))
+            _upsert_notes(conn, notes, decks)
+
+        if incremental and deck_summary != _mirror_meta(conn, "deck_summary"):
+            changed = set(changed_ids)
+            note_by_card = {card_id: note_id for note_id, card_id in
+                            conn.execute("SELECT note_id, first_card FROM notes WHERE first_card IS NOT NULL")
+                            if note_id not in changed}
+            first_cards = list(note_by_card)
+            for start in range(0, len(first_cards), MIRROR_CHUNK_SIZE):
+                decks = _anki_invoke("getDecks", cards=first_cards[start:start + MIRROR_CHUNK_SIZE]) or {}
+                conn.executemany("UPDATE notes SET deck_name = ? WHERE note_id = ?",
+                                 ((deck_name, note_by_card[card_id]) for deck_name, card_ids in decks.items()
+                                  for card_id in card_ids if card_id in note_by_card))
+
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS live_ids (note_id INTEGER PRIMARY KEY)")
+        conn.execute("DELETE FROM live_ids")
+        conn.executemany("INSERT OR IGNORE INTO live_ids VALUES (?)", ((note_id,) for note_id in all_ids))
+        deleted = conn.execute("DELETE FROM notes WHERE note_id NOT IN (SELECT note_id FROM live_ids)").rowcount
+        if deleted:
+            conn.execute("DELETE FROM trigrams WHERE note_id NOT IN (SELECT note_id FROM live_ids)")
+            conn.execute("DELETE FROM forms WHERE note_id NOT IN (SELECT note_id FROM live_ids)")
+
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('last_sync', ?)", (str(started),))
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('schema', ?)", (SCHEMA.digest,))
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('deck_summary', ?)", (deck_summary,))
+    conn.close()
+    return len(changed_ids), deleted
+
+def _mirror_schema(conn: "sqlite3.Connection") -> str:
+    """Returns the digest of the schema the mirror was built with (mirrors from before --schema used the default)."""
+    return _mirror_meta(conn, "schema") or DEFAULT_SEARCH_SCHEMA.digest
+
+def mirror_age(path: str = MIRROR_PATH) -> float | None:
+    """
+    Returns the number of seconds since the last sync, or None if there is no mirror.
 
-    # Step 1: Find the IDs of cards matching the query.
-    payload = {
-        "action": "findCards",
-        "version": 6,
-        "params": { "query": query }
-    }
+    A mirror built with another schema counts as infinitely old, so that it is synced before it is used.
+    """
+    if not os.path.exists(path):
+        return None
+    conn = _open_mirror(path)
     try:
-        response = requests.post(anki_connect_url, json=payload)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        print(f"Error connecting to AnkiConnect: {e}")
+        last_sync = _mirror_meta(conn, "last_sync")
+        outdated = _mirror_schema(conn) != SCHEMA.digest
+    finally:
+        conn.close()
+    if last_sync is None:
         return None
+    return math.inf if outdated else time.time() - float(last_sync)
+
+def search_mirror(search_word: str, search_type: str, html_output: bool = False, path: str = MIRROR_PATH,
+                  use_index: bool = True, limit: int | None = None,
+                  rank: bool = False, top: int | None = None) -> list[Card] | None:
+    """
+    Answers the same searches as search_word_in_decks() from the local mirror.
+
+    Results are returned per note (not per card), with the deck of the note's first card.
+    Terms of three or more characters are looked up in the trigram index first; only the
+    candidate notes that contain every trigram of the term are then checked with instr().
+    A 'lemma' search looks the normalized term up in the lemma index instead and only
+    returns vocabulary notes that list it as WordSource or as one of its inflected forms.
+
+    Args:
+        search_word (str): The term to search for.
+        search_type (str): The type of search: 'word', 'sentence' or 'lemma'.
+        html_output (bool): If True, field values are returned with HTML tags.
+        path (str): Location of the mirror database.
+        use_index (bool): If False, scan every note instead of using the trigram index.
+        limit (int | None): Maximum number of results.
+        rank (bool): If True, order the results with rank_items() instead of by note ID.
+        top (int | None): With rank, keep only the best top results.
+
+    Returns:
+        A list of Card records, or None if nothing matches.
+    """
+    if search_type in SCHEMA.mirror:
+        scope, match, required = SCHEMA.mirror[search_type]
+    elif search_type == "lemma":
+        # Lemma lookups return the notes a word search would (same required fields).
+        scope, match, required = None, "note_id IN (SELECT note_id FROM forms WHERE form = :form)", SCHEMA.mirror["word"][2]
+    else:
+        raise ValueError("Invalid search_type. Must be 'word', 'sentence' or 'lemma'.")
+    where = f"{match} AND {required}" if required else match
+
+    term = search_word.lower()
+    params = {"term": term, "scope": scope, "form": normalize_form(search_word)}
+    grams = sorted(_trigrams(term)) if use_index and scope is not None else []
+    if grams:
+        params.update((f"g{i}", gram) for i, gram in enumerate(grams))
+        candidates = " INTERSECT ".join(
+            f"SELECT note_id FROM trigrams WHERE scope = :scope AND gram = :g{i}" for i in range(len(grams)))
+        where = f"note_id IN ({candidates}) AND {where}"
+
+    columns = ", ".join(f'"{name}"' for name in MIRROR_FIELDS)
+    conn = _open_mirror(path)
+    try:
+        params["limit"] = -1 if limit is None else limit  # A negative LIMIT means no limit in SQLite.
+        with PROFILER.span("mirror:query"):
+            rows = conn.execute(f"SELECT {columns}, deck_name, note_id FROM notes WHERE {where} ORDER BY note_id LIMIT :limit",
+                                params).fetchall()
+    finally:
+        conn.close()
+    if rank:
+        rows = rank_items(rows, search_word, top, fields=_row_rank_fields)
+    return _parse_rows(rows, html_output) or None
+
+def _open_collection(path: str = COLLECTION_PATH, snapshot: bool = False) -> "sqlite3.Connection":
+    """
+    Opens an Anki collection read-only.
+
+    The database is opened with SQLite's read-only mode, which also reads pending
+    changes from the write-ahead log. If that is not possible (e.g. Anki holds a lock)
+    or snapshot is True, the collection (with its WAL file) is copied to a temporary
+    directory and loaded into memory, and the copy is removed right away.
+
+    Raises:
+        sqlite3.Error: If the collection cannot be read.
+        OSError: If the collection does not exist.
+    """
+    import shutil
+    import sqlite3
+    import tempfile
+    if not os.path.exists(path):
+        raise OSError(f"Collection not found: {path}")
+    if not snapshot:
+        try:
+            conn = sqlite3.connect(f"file:{_sqlite_uri_path(path)}?mode=ro", uri=True)
+            conn.execute("SELECT 1 FROM notes LIMIT 1")
+            return conn
+        except sqlite3.OperationalError:
+            pass  # Locked or WAL not readable; fall back to a snapshot.
+
+    directory = tempfile.mkdtemp(prefix="anki-search-")
+    copy = os.path.join(directory, "collection.anki2")
+    for suffix in ("", "-wal"):
+        if os.path.exists(path + suffix):
+            shutil.copyfile(path + suffix, copy + suffix)
+    conn = sqlite3.connect(":memory:")
+    try:
+        # The copy is closed before it is removed, as Windows cannot remove open files.
+        source = sqlite3.connect(f"file:{_sqlite_uri_path(copy)}?mode=ro", uri=True)
+        try:
+            source.backup(conn)
+        finally:
+            source.close()
+        conn.execute("SELECT 1 FROM notes LIMIT 1")
+    except sqlite3.Error:
+        conn.close()
+        raise
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return conn
+
+def _sqlite_uri_path(path: str) -> str:
+    """Escapes a file system path for use in an SQLite URI."""
+    return os.path.abspath(path).replace("\\", "/").replace("?", "%3f").replace("#", "%23")
+
+def _collection_schema(conn: "sqlite3.Connection") -> tuple[dict[int, list[str]], dict[int, str], dict[int, str]]:
+    """
+    Reads the field order and name of every note type and the names of all decks.
+
+    Supports both the current schema (notetypes/fields/decks tables) and the older
+    one that kept note types and decks as JSON in the col table.
+
+    Returns:
+        A tuple (field_names_by_note_type, deck_names_by_id, note_type_names_by_id).
+    """
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if "fields" in tables and "decks" in tables:
+        field_names = {}
+        for note_type_id, name in conn.execute("SELECT ntid, name FROM fields ORDER BY ntid, ord"):
+            field_names.setdefault(note_type_id, []).append(name)
+        # Deck levels are separated by \x1f in the decks table and by '::' everywhere else.
+        deck_names = {deck_id: name.replace("\x1f", "::") for deck_id, name in conn.execute("SELECT id, name FROM decks")}
+        note_type_names = dict(conn.execute("SELECT id, name FROM notetypes")) if "notetypes" in tables else {}
+    else:
+        models_json, decks_json = conn.execute("SELECT models, decks FROM col").fetchone()
+        models = json.loads(models_json)
+        field_names = {int(model_id): [field["name"] for field in sorted(model["flds"], key=lambda field: field["ord"])]
+                       for model_id, model in models.items()}
+        deck_names = {int(deck_id): deck["name"] for deck_id, deck in json.loads(decks_json).items()}
+        note_type_names = {int(model_id): model.get("name") for model_id, model in models.items()}
+    return field_names, deck_names, note_type_names
+
+def _collection_matchers(field_names: dict[int, list[str]], note_type_names: dict[int, str],
+                         search_type: str) -> dict[int, tuple]:
+    """
+    Translates a search mode of the schema into field positions per note type of a collection.
+
+    Returns:
+        A mapping of note type ID to (role positions, searched positions, positions of
+        which one must be filled, positions that must be empty). Note types that
+        cannot match are left out.
+    """
+    search, require_any, require_empty = SCHEMA.modes[search_type]
+    matchers = {}
+    for note_type_id, names in field_names.items():
+        mapped = SCHEMA.field_names(note_type_names.get(note_type_id))
+        if mapped is None:
+            continue
+        positions = [names.index(name) if name in names else None for name in mapped]
+        searched = [positions[role] for role in search if positions[role] is not None]
+        filled = [positions[role] for role in require_any if positions[role] is not None]
+        if not searched or require_any and not filled:
+            continue
+        if any(mapped[role] and positions[role] is None for role in require_empty):
+            continue  # Like "Field:" in Anki, a field that must be empty has to exist.
+        empty = [positions[role] for role in require_empty if positions[role] is not None]
+        matchers[note_type_id] = (positions, searched, filled, empty)
+    return matchers
+
+def search_collection(search_word: str, search_type: str, html_output: bool = False,
+                      path: str = COLLECTION_PATH, retrieval: str = "cards", limit: int | None = None,
+                      snapshot: bool = False, rank: bool = False, top: int | None = None) -> list[Card] | None:
+    """
+    Runs the searches of search_word_in_decks() directly on the collection file.
+
+    Works while Anki is closed or busy, without going through AnkiConnect. Note
+    fields are split on Anki's \x1f separator and read by position, with the field
+    order of the note type; the word and sentence conditions are the same as in
+    build_search_query(), matched case-insensitively. Cards are returned in card ID
+    order, like findCards.
+
+    Args:
+        search_word (str): The term to search for.
+        search_type (str): The type of search, either 'word' or 'sentence'.
+        html_output (bool): If True, field values are returned with HTML tags.
+        path (str): Location of collection.anki2.
+        retrieval (str): 'cards' lists every matching card, 'notes' every matching note once.
+        limit (int | None): Maximum number of results.
+        snapshot (bool): If True, read a copy of the collection instead of the file itself.
+        rank (bool): If True, order the results with rank_items() instead of by card ID.
+        top (int | None): With rank, keep only the best top results.
+
+    Returns:
+        A list of Card records, or None if nothing matches.
+
+    Raises:
+        sqlite3.Error, OSError: If the collection cannot be read.
+    """
+    if search_type not in SCHEMA.modes:
+        raise ValueError("Invalid search_type. Must be 'word' or 'sentence'.")
+    if retrieval not in ("cards", "notes"):
+        raise ValueError("Invalid retrieval. Must be 'cards' or 'notes'.")
+    term = search_word.lower()
+
+    conn = _open_collection(path, snapshot)
+    try:
+        with PROFILER.span("collection:search"):
+            field_names, deck_names, note_type_names = _collection_schema(conn)
+            matchers = _collection_matchers(field_names, note_type_names, search_type)
+            matched = {}  # note ID -> role values
+            placeholders = ", ".join("?" * len(matchers))
+            for note_id, note_type_id, flds in conn.execute(
+                    f"SELECT id, mid, flds FROM notes WHERE mid IN ({placeholders})", list(matchers)):
+                if term not in flds.lower():
+                    continue  # Cheap rejection before the fields are split.
+                positions, searched, filled, empty = matchers[note_type_id]
+                values = flds.split("\x1f")
+                if (any(term in values[position].lower() for position in searched)
+                        and (not filled or any(values[position] for position in filled))
+                        and not any(values[position] for position in empty)):
+                    matched[note_id] = [values[position] if position is not None else "" for position in positions]
+
+            rows = []
+            seen_notes = set()
+            for card_id, note_id, deck_id in conn.execute("SELECT id, nid, did FROM cards ORDER BY id"):
+                if note_id not in matched or (retrieval == "notes" and note_id in seen_notes):
+                    continue
+                seen_notes.add(note_id)
+                rows.append((*matched[note_id], deck_names.get(deck_id, ""), note_id))
+                if limit is not None and len(rows) >= limit:
+                    break
+    finally:
+        conn.close()
+    if rank:
+        rows = rank_items(rows, search_word, top, fields=_row_rank_fields)
+    return _parse_rows(rows, html_output) or None
+
+def _open_cache(path: str = CACHE_PATH) -> "sqlite3.Connection":
+    """Opens (and if necessary creates) the result cache database."""
+    import sqlite3
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            output TEXT NOT NULL,
+            fingerprint TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            last_used REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value REAL NOT NULL);
+    """)
+    if "prefetched" not in {row[1] for row in conn.execute("PRAGMA table_info(entries)")}:
+        # Caches created before --prefetch existed get the column once.
+        with conn:
+            conn.execute("ALTER TABLE entries ADD COLUMN prefetched INTEGER NOT NULL DEFAULT 0")
+    return conn
+
+def _count(conn: "sqlite3.Connection", **deltas: float):
+    """Adds to the named counters of the cache's stats table."""
+    with conn:
+        conn.executemany("INSERT INTO stats VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                         deltas.items())
+
+def collection_fingerprint() -> str:
+    """
+    Returns a cheap fingerprint that changes whenever notes are added, edited or deleted.
+
+    It is built from the notes edited during the last day (their number and the
+    latest modification time) and from the number of cards in every deck, which
+    changes when notes are deleted or cards are moved to another deck. Only small
+    answers are transferred, independent of the collection size.
+
+    Raises:
+        AnkiConnectError: If AnkiConnect cannot be reached.
+    """
+    note_ids = _anki_invoke("findNotes", query="edited:1") or []
+    latest = 0
+    if note_ids:
+        try:
+            latest = max(entry.get("mod", 0) for entry in _anki_invoke("notesModTime", notes=note_ids) or [{}])
+        except AnkiConnectError:
+            # notesModTime is missing from older AnkiConnect versions.
+            latest = max(note.get("mod", 0) for note in _anki_invoke("notesInfo", notes=note_ids) or [{}])
+    return f"{len(note_ids)}:{max(note_ids, default=0)}:{latest}:{_deck_summary()}"
+
+def _deck_summary() -> str:
+    """
+    Returns a digest of the number of cards in every deck (deckNames + getDeckStats).
+
+    It changes when cards are moved to another deck or deleted, which leaves the
+    modification time of the remaining notes untouched.
+
+    Raises:
+        AnkiConnectError: If AnkiConnect cannot be reached.
+    """
+    import hashlib
+    deck_stats = _anki_invoke("getDeckStats", decks=_anki_invoke("deckNames") or []) or {}
+    decks = sorted((stats.get("name", ""), stats.get("total_in_deck", 0)) for stats in deck_stats.values())
+    return hashlib.sha1(json.dumps(decks, ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+
+def _cache_fingerprint(conn: "sqlite3.Connection", check_interval: float) -> str | None:
+    """
+    Returns the collection fingerprint, asking Anki at most once per check_interval.
+
+    If Anki cannot be reached, the last known fingerprint is returned, so cached
+    results remain available while Anki is closed.
+    """
+    meta = dict(conn.execute("SELECT key, value FROM meta WHERE key IN ('fingerprint', 'checked_at')"))
+    if "fingerprint" in meta and time.time() - float(meta.get("checked_at", 0)) < check_interval:
+        return meta["fingerprint"]
+    try:
+        fingerprint = collection_fingerprint()
+    except AnkiConnectError:
+        return meta.get("fingerprint")
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (fingerprint,))
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('checked_at', ?)", (str(time.time()),))
+    return fingerprint
+
+def cache_lookup(key: str, check_interval: float = CACHE_CHECK_INTERVAL, path: str = CACHE_PATH) -> str | None:
+    """
+    Returns the cached output for a key, or None if it is missing or outdated.
+
+    Args:
+        key (str): Cache key, see _cache_key().
+        check_interval (float): Seconds during which the collection is assumed unchanged.
+        path (str): Location of the cache database.
+    """
+    conn = _open_cache(path)
+    try:
+        row = conn.execute("SELECT output, fingerprint, prefetched FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] != _cache_fingerprint(conn, check_interval):
+            _count(conn, lookups=1)
+            return None
+        with conn:
+            conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        _count(conn, lookups=1, hits=1, prefetch_hits=row[2])
+        return row[0]
+    finally:
+        conn.close()
+
+def cache_store(key: str, output: str, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES,
+                check_interval: float = CACHE_CHECK_INTERVAL, path: str = CACHE_PATH, prefetched: bool = False):
+    """
+    Stores rendered output and evicts the least recently used entries beyond the bounds.
+
+    Args:
+        key (str): Cache key, see _cache_key().
+        output (str): The text printed for the key.
+        max_entries (int): Maximum number of cached outputs.
+        max_bytes (int): Maximum total size of the cached outputs in bytes.
+        check_interval (float): Seconds during which the collection is assumed unchanged.
+        path (str): Location of the cache database.
+        prefetched (bool): If True, the output was stored by prefetch() ahead of a lookup.
+    """
+    cache_store_many([(key, output)], max_entries, max_bytes, check_interval, path, prefetched)
+
+def cache_store_many(outputs: list[tuple[str, str]], max_entries: int = CACHE_MAX_ENTRIES,
+                     max_bytes: int = CACHE_MAX_BYTES, check_interval: float = CACHE_CHECK_INTERVAL,
+                     path: str = CACHE_PATH, prefetched: bool = False) -> int:
+    """
+    Stores several (key, output) pairs like cache_store(), in one transaction with one eviction pass.
+
+    Returns:
+        The number of outputs stored (outputs larger than max_bytes are skipped).
+    """
+    conn = _open_cache(path)
+    try:
+        fingerprint = _cache_fingerprint(conn, check_interval)
+        if fingerprint is None:
+            return 0  # Without a fingerprint the entries could never be validated.
+        now = time.time()
+        rows = [(key, output, fingerprint, size, now, int(prefetched))
+                for key, output in outputs if (size := len(output.encode("utf-8"))) <= max_bytes]
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", rows)
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            for old_key, old_size in conn.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+                if count <= max_entries and total <= max_bytes:
+                    break
+                conn.execute("DELETE FROM entries WHERE key = ?", (old_key,))
+                count -= 1
+                total -= old_size
+    finally:
+        conn.close()
+    return len(rows)
+
+def _cache_key(args: argparse.Namespace) -> str:
+    """
+    Builds the cache key of a --query invocation from every option that changes its output.
+
+    The term is lowercased: Anki and the mirror match it case-insensitively, so 'Haus'
+    and 'haus' share one entry.
+    """
+    return json.dumps([args.query.lower(), args.search_type, args.html, args.format, args.retrieval, args.limit,
+                       args.rank, args.top, SCHEMA.digest, _result_source(args)], ensure_ascii=False)
+
+def _result_source(args: argparse.Namespace) -> str:
+    """Where --query takes its results from: the local mirror lists notes, AnkiConnect and the collection cards."""
+    if args.backend == "direct":
+        return "direct"
+    return "ankiconnect" if args.no_mirror or not os.path.exists(MIRROR_PATH) else "mirror"
+
+def prefetch_words(text: str, max_words: int = PREFETCH_MAX_WORDS) -> list[str]:
+    """Returns the distinct words of a text (ignoring case) in reading order, skipping short words and numbers."""
+    seen = set()
+    words = []
+    for match in PREFETCH_WORD_PATTERN.finditer(text):
+        word = match.group()
+        if word.lower() in seen:
+            continue
+        seen.add(word.lower())
+        words.append(word)
+        if len(words) >= max_words:
+            break
+    return words
+
+def prefetch(words: list[str], args: argparse.Namespace) -> tuple[int, int] | None:
+    """
+    Looks up words ahead of time and stores their --query output in the result cache.
+
+    Words whose output is already cached for the current collection fingerprint are
+    skipped. The others are resolved with the same backend as --query: from the local
+    mirror if it is used, otherwise with the batched word queries of
+    search_words_batch(). The output is rendered with the options in args and stored
+    under the word's cache key (see _cache_key()), all in one transaction, so a later
+    '--query word' with the same options, in any case, is a cache hit. The time,
+    AnkiConnect requests and response bytes spent are added to the cache's counters.
 
-    card_ids = response.json().get("result")
-    if not card_ids:
-        return None # No cards found.
-
-    # Step 2: Retrieve detailed information for the found card IDs.
-    payload = {
-        "action": "cardsInfo",
-        "version": 6,
-        "params": { "cards": card_ids }
-    }
-    try:
-        response = requests.post(anki_connect_url, json=payload)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        print(f"Error retrieving card information: {e}")
+    Returns:
+        A tuple (words looked up, cache entries stored), or None for a lemma search
+        without a local mirror.
+
+    Raises:
+        AnkiConnectError: If AnkiConnect cannot be reached.
+    """
+    def key(word: str) -> str:
+        return _cache_key(argparse.Namespace(**{**vars(args), "query": word}))
+
+    conn = _open_cache()
+    try:
+        fingerprint = _cache_fingerprint(conn, args.cache_check_interval)
+        cached = {key for (key,) in conn.execute("SELECT key FROM entries WHERE fingerprint = ?", (fingerprint,))}
+    finally:
+        conn.close()
+    todo = [word for word in words if key(word) not in cached]
+
+    before = dict(TRANSPORT_STATS)
+    started = time.perf_counter()
+    if _mirror_ready(args):
+        results = ((word, search_mirror(word, args.search_type, html_output=args.html, limit=args.limit,
+                                        rank=args.rank, top=args.top)) for word in todo)
+    elif args.search_type == "lemma":
         return None
+    else:
+        results = search_words_batch(todo, args.search_type, html_output=args.html, batch_size=max(1, args.batch_size),
+                                     retrieval=args.retrieval, rank=args.rank, top=args.top, page_size=args.page_size)
+    outputs = []
+    try:
+        for word, result in results:
+            outputs.append((key(word), render_cards((result or [])[:args.limit], args.format)))
+    finally:
+        # Also keeps the words looked up before a failure.
+        stored = cache_store_many(outputs, args.cache_entries, args.cache_size, args.cache_check_interval,
+                                  prefetched=True)
 
-    # Step 3: Parse and format the card data.
-    card_data = []
-    for card in response.json().get("result", []):
-        fields = card.get("fields", {})
-
-        def get_field_value(field_name: str) -> str:
-            """Helper to safely extract field values and optionally strip HTML."""
-            value = fields.get(field_name, {}).get("value", "")
-            return value if html_output else _strip_html(value)
-
-        card_data.append({
-            "WordSource": get_field_value("WordSource"),
-            "WordSourceIPA": get_field_value("WordSourceIPA"),
-            "WordDestination": get_field_value("WordDestination"),
-            "SentenceSource": get_field_value("SentenceSource"),
-            "WordSourceInflectedForm": get_field_value("WordSourceInflectedForm"),
-            "SentenceDestination": get_field_value("SentenceDestination"),
-            "SentenceDestination2": get_field_value("SentenceDestination2"),
-            "WordSourceMorphologyAI": get_field_value("WordSourceMorphologyAI"),
-            "DeckName": card.get("deckName", "")
-        })
-    return card_data
+    conn = _open_cache()
+    try:
+        _count(conn, prefetch_words=len(todo), prefetch_entries=stored,
+               prefetch_seconds=time.perf_counter() - started,
+               prefetch_requests=TRANSPORT_STATS["requests"] - before["requests"],
+               prefetch_bytes=TRANSPORT_STATS["bytes"] - before["bytes"])
+    finally:
+        conn.close()
+    return len(todo), stored
+
+def print_cache_stats() -> int:
+    """Prints the hit rate of the result cache and what prefetching cost."""
+    conn = _open_cache()
+    try:
+        stats = collections.defaultdict(float, conn.execute("SELECT name, value FROM stats"))
+        entries, prefetched = conn.execute("SELECT COUNT(*), COALESCE(SUM(prefetched), 0) FROM entries").fetchone()
+    finally:
+        conn.close()
+    lookups, hits = stats["lookups"], stats["hits"]
+    print(f"entries:            {entries} ({prefetched} prefetched)")
+    print(f"lookups:            {lookups:.0f}")
+    print(f"hits:               {hits:.0f} ({hits / lookups if lookups else 0:.1%})")
+    print(f"hits on prefetched: {stats['prefetch_hits']:.0f} "
+          f"({stats['prefetch_hits'] / lookups if lookups else 0:.1%} of lookups)")
+    print(f"prefetched words:   {stats['prefetch_words']:.0f} in {stats['prefetch_seconds']:.1f} s, "
+          f"{stats['prefetch_requests']:.0f} requests, {stats['prefetch_bytes'] / 1024:.0f} KiB")
+    if stats["prefetch_words"]:
+        print(f"cost per word:      {stats['prefetch_seconds'] * 1000 / stats['prefetch_words']:.1f} ms")
+    return 0
+
+class _Tee(io.TextIOBase):
+    """Writes to a stream and keeps a copy of everything written."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.copy = io.StringIO()
+
+    def write(self, text: str) -> int:
+        self.copy.write(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+def _clean_text(text: str) -> str:
+    """
+    Converts HTML to plain text: tags are replaced by spaces, entities such as &nbsp;
+    and &amp; are decoded, and whitespace runs are collapsed to single spaces.
+    """
+    if "<" in text:
+        text = HTML_TAG_PATTERN.sub(" ", text)
+    if "&" in text:
+        decoded = text
+        for entity, char in COMMON_ENTITIES:
+            decoded = decoded.replace(entity, char)
+        # &amp; goes last so that "&amp;lt;" stays "&lt;"; anything rarer takes the slow path.
+        if decoded.count("&") == decoded.count("&amp;"):
+            text = decoded.replace("&amp;", "&")
+        else:
+            import html
+            text = html.unescape(text)
+    return " ".join(text.split())
+
+def _clean_batch(values: list[str]) -> list[str]:
+    """
+    Converts many HTML field values to plain text in one pass.
+
+    The values are joined into a single string, so every pattern of _clean_text()
+    runs once per batch instead of once per field.
+    """
+    if not values:
+        return []
+    text = FIELD_SEPARATOR.join(values)
+    if text.count(FIELD_SEPARATOR) != len(values) - 1:
+        # A field contains the separator itself; it would split into two.
+        text = FIELD_SEPARATOR.join(value.replace(FIELD_SEPARATOR, " ") for value in values)
+    return [value.strip(" ") for value in _clean_text(text).split(FIELD_SEPARATOR)]
+
+class FieldCleaner:
+    """
+    Strips HTML from field values, batch by batch.
+
+    With processes > 1, batches of at least parallel_min_chars characters are split
+    into chunks that are cleaned in a pool of worker processes. The pool is created
+    on first use and kept for the life of the process (e.g. the daemon).
+    """
+
+    def __init__(self, processes: int = 0, parallel_min_chars: int = CLEAN_PARALLEL_MIN_CHARS):
+        self.processes = processes
+        self.parallel_min_chars = parallel_min_chars
+        self._executor = None
+
+    def clean(self, values: list[str]) -> list[str]:
+        """Returns the plain-text versions of the values, in the same order."""
+        if self.processes > 1 and len(values) >= self.processes and sum(map(len, values)) >= self.parallel_min_chars:
+            if self._executor is None:
+                from concurrent.futures import ProcessPoolExecutor
+                self._executor = ProcessPoolExecutor(max_workers=self.processes)
+            size = math.ceil(len(values) / (self.processes * 4))
+            chunks = [values[start:start + size] for start in range(0, len(values), size)]
+            return [value for chunk in self._executor.map(_clean_batch, chunks) for value in chunk]
+        return _clean_batch(values)
+
+    def close(self):
+        """Shuts the process pool down, if one was started."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def clean_rows(self, rows: list[list[str]]) -> list[list[str]]:
+        """Cleans rows of equally many fields (one row per card) as a single batch."""
+        if not rows:
+            return []
+        width = len(rows[0])
+        values = self.clean([value for row in rows for value in row])
+        return [values[start:start + width] for start in range(0, len(values), width)]
+
+# Cleaner used for all search results (see --clean-processes).
+FIELD_CLEANER = FieldCleaner()
 
 def _strip_html(text: str) -> str:
-    """A simple utility to remove HTML tags from a string."""
-    clean = re.compile('<.*?>')
-    text = re.sub(clean, ' ', text)
-    return ' '.join(text.split()) # Consolidate multiple spaces into one.
+    """Removes HTML tags and entities from a single string, without the batching of _clean_batch()."""
+    if FIELD_SEPARATOR in text:
+        text = text.replace(FIELD_SEPARATOR, " ")  # As in a batch, where it would end the field.
+    return _clean_text(text)
 
-# --- Main execution block ---
-if __name__ == "__main__":
-    # Set up the command-line argument parser.
+def _card_lines(card: Card, dash: str) -> list[str]:
+    """Returns the non-empty output lines of a card; dash joins WordSource and WordDestination."""
+    lines = []
+    if card.WordSource:
+        lines.append(f"{card.WordSource} {dash} {card.WordDestination}" if card.WordDestination else card.WordSource)
+    # Add other fields if they exist
+    if card.WordSourceIPA: lines.append(f"[{card.WordSourceIPA}]")
+    if card.WordSourceInflectedForm: lines.append(card.WordSourceInflectedForm)
+    if card.SentenceSource: lines.append(card.SentenceSource)
+    if card.SentenceDestination: lines.append(f"- {card.SentenceDestination}")
+    if card.SentenceDestination2: lines.append(f"- {card.SentenceDestination2}")
+    if card.WordSourceMorphologyAI: lines.append(card.WordSourceMorphologyAI)
+    if card.DeckName: lines.append(f"deck:{card.DeckName}")
+    return lines
+
+def _format_plain(card: Card) -> str:
+    """Renders a card as plain text, one field per line."""
+    return "".join(line + "\n" for line in _card_lines(card, "—"))
+
+def _format_html(card: Card) -> str:
+    """Renders a card as HTML, with <br> between the fields."""
+    return "<br>\n".join(_card_lines(card, "-")) + "\n"
+
+def _format_ndjson(card: Card, extra: dict | None = None) -> str:
+    """Renders a card as one JSON line; extra keys (e.g. the query of a batch) come first."""
+    record = {**extra, **card.as_dict()} if extra else card.as_dict()
+    return json.dumps(record, ensure_ascii=False) + "\n"
+
+# Card renderer and the separator written between two cards, per text format.
+FORMATTERS = {
+    "plain": (_format_plain, "\t\n"),
+    "html": (_format_html, "<br><br>\n"),
+}
+
+def render_cards(cards: list[Card], output_format: str, extra: dict | None = None) -> str:
+    """
+    Renders cards into a single string in one of OUTPUT_FORMATS.
+
+    Args:
+        cards (list[Card]): The cards to render.
+        output_format (str): 'plain', 'html', 'json' (one array) or 'ndjson' (one object per line).
+        extra (dict | None): Keys added to every NDJSON record.
+
+    Returns:
+        The rendered text, ending with a newline unless there are no cards.
+    """
+    if output_format == "json":
+        return json.dumps([card.as_dict() for card in cards], ensure_ascii=False) + "\n"
+    if output_format == "ndjson":
+        return "".join(_format_ndjson(card, extra) for card in cards)
+    formatter, separator = FORMATTERS[output_format]
+    return separator.join(formatter(card) for card in cards)
+
+def print_results(result, output_format: str = "plain", extra: dict | None = None) -> int:
+    """
+    Prints cards with a single buffered write, or streams them as NDJSON.
+
+    In the 'plain', 'html' and 'json' formats, the whole output is rendered first
+    and written at once. In 'ndjson', every card is written (and flushed) as it is
+    consumed, so a generator such as iter_search_results() shows its first page
+    before later pages are fetched.
+
+    Args:
+        result (Iterable[Card]): Cards as returned by search_word_in_decks() or
+                                 iter_search_results().
+        output_format (str): One of OUTPUT_FORMATS.
+        extra (dict | None): Keys added to every NDJSON record.
+
+    Returns:
+        The number of cards printed.
+    """
+    # Fetching done by a generator is timed by its own spans inside this one.
+    with PROFILER.span("render"):
+        if output_format == "ndjson":
+            count = 0
+            for card in result:
+                sys.stdout.write(_format_ndjson(card, extra))
+                sys.stdout.flush()
+                count += 1
+            return count
+        cards = list(result)
+        sys.stdout.write(render_cards(cards, output_format))
+        sys.stdout.flush()
+        return len(cards)
+
+def serve():
+    """
+    Runs the resident daemon that answers forwarded command-line invocations.
+
+    Each request is a JSON object of the form {"argv": [...], "cwd": "...", "stdin": "..."}
+    sent over the daemon socket: the arguments, the caller's working directory (relative
+    paths are resolved against it) and, for '--query-file -' and '--prefetch -', the
+    caller's standard input. The reply carries the captured output and the exit status.
+    Requests are handled one at a time, so the imported modules and the process stay
+    warm between hotkey lookups. Clients authenticate with the key in DAEMON_KEY_PATH.
+    """
+    os.makedirs(APP_DIR, mode=0o700, exist_ok=True)
+    if DAEMON_FAMILY == "AF_UNIX" and os.path.exists(DAEMON_ADDRESS):
+        os.remove(DAEMON_ADDRESS)  # Stale socket left behind by a previous run.
+    authkey = os.urandom(32)
+    with os.fdopen(os.open(DAEMON_KEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as handle:
+        handle.write(authkey)
+    os.chmod(DAEMON_KEY_PATH, 0o600)  # Also if the file was left behind with other permissions.
+
+    from multiprocessing.connection import AuthenticationError, Listener
+    with Listener(DAEMON_ADDRESS, family=DAEMON_FAMILY, authkey=authkey) as listener:
+        print(f"Serving on {DAEMON_ADDRESS}")
+        while True:
+            try:
+                conn = listener.accept()
+            except (OSError, EOFError, AuthenticationError) as e:
+                print(f"Error accepting client connection: {e}")
+                continue
+            with conn:
+                try:
+                    request = json.loads(conn.recv_bytes())
+                    argv = [str(arg) for arg in request.get("argv", [])]
+                    cwd, stdin = request.get("cwd"), request.get("stdin")
+                except (EOFError, OSError, ValueError, AttributeError):
+                    continue  # The client went away or sent garbage.
+                reply = _run_captured(argv, cwd, stdin)
+                try:
+                    conn.send_bytes(json.dumps(reply).encode("utf-8"))
+                except OSError:
+                    pass  # The client did not wait for the answer.
+
+def _run_captured(argv: list[str], cwd: str | None = None, stdin: str | None = None) -> dict:
+    """Runs main() for a daemon client in its working directory, with its stdin, and captures everything it prints."""
+    buffer = io.StringIO()
+    daemon_cwd, daemon_stdin = os.getcwd(), sys.stdin
+    sys.stdin = io.StringIO(stdin or "")
+    with contextlib.redirect_stdout(buffer), contextlib.redirect_stderr(buffer):
+        try:
+            if cwd:
+                os.chdir(cwd)
+            status = main(argv, forwarded=True)
+        except SystemExit as e:  # argparse exits on --help and usage errors.
+            status = e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            print(f"Error: {e}")
+            status = 1
+        finally:
+            os.chdir(daemon_cwd)
+            sys.stdin = daemon_stdin
+    return {"output": buffer.getvalue(), "status": status or 0}
+
+def lookup(args: argparse.Namespace) -> str | None:
+    """
+    Renders the results of args.query in args.format, as --query would print them.
+
+    Returns:
+        The rendered text, or None for a lemma search without a local mirror.
+
+    Raises:
+        AnkiConnectError: If AnkiConnect cannot be reached.
+        sqlite3.Error, OSError: If the collection cannot be read.
+    """
+    if args.search_type == "all":
+        return render_groups(_find_groups(args), args.format)
+    result = _find(args)
+    return None if result is None else render_cards(list(result), args.format)
+
+def _lookup_fingerprint(args: argparse.Namespace) -> str | None:
+    """
+    Returns the collection fingerprint that lookup ETags are derived from.
+
+    With AnkiConnect, this is the result cache's fingerprint, which asks Anki at most
+    once per --cache-check-interval; with the direct backend, the modification times
+    and sizes of the collection file and its write-ahead log, where Anki's edits land
+    until the next checkpoint. None if it cannot be determined.
+    """
+    if args.backend == "direct":
+        parts = []
+        for suffix in ("", "-wal"):
+            try:
+                stat = os.stat(args.collection + suffix)
+            except FileNotFoundError:
+                if suffix:
+                    continue  # No pending changes.
+                return None
+            except OSError:
+                return None
+            parts.append(f"{stat.st_mtime_ns}-{stat.st_size}")
+        return ":".join(parts)
+    conn = _open_cache()
+    try:
+        return _cache_fingerprint(conn, args.cache_check_interval)
+    finally:
+        conn.close()
+
+def serve_http(args: argparse.Namespace):
+    """
+    Serves lookups over HTTP for GoldenDict's "Websites" dictionaries.
+
+    GET /lookup?word=... answers with the rendered results of --query word, as an
+    HTML page by default. The optional 'type' and 'format' parameters override
+    --search-type and --format. Each response carries an ETag derived from the
+    query and the collection fingerprint; a request whose If-None-Match matches it
+    is answered with 304 Not Modified before any search is run. Rendered results
+    are shared with the result cache of --query.
+
+    Requests are handled by --http-workers threads. AnkiConnect sessions are kept
+    per thread by ANKI_CLIENT, so each worker reuses its connection to Anki.
+    """
+    import hashlib
+    import html
+    import sqlite3
+    from concurrent.futures import ThreadPoolExecutor
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from urllib.parse import parse_qs, urlsplit
+
+    class _PooledHTTPServer(HTTPServer):
+        """
+        HTTP server that handles requests on a fixed pool of worker threads.
+
+        Unlike ThreadingHTTPServer, it never starts more than `workers` threads: while
+        all of them are busy, new connections wait in the listen backlog.
+        """
+
+        def __init__(self, address: tuple[str, int], handler, workers: int):
+            super().__init__(address, handler)
+            self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="http")
+            self.slots = threading.BoundedSemaphore(workers)
+
+        def process_request(self, request, client_address):
+            self.slots.acquire()
+            self.pool.submit(self._process, request, client_address)
+
+        def _process(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                self.slots.release()
+
+        def server_close(self):
+            super().server_close()
+            self.pool.shutdown(wait=False)
+
+    cacheable = not args.no_cache and args.backend != "direct"
+    content_types = {"plain": "text/plain", "html": "text/html", "json": "application/json",
+                     "ndjson": "application/x-ndjson"}
+
+    class LookupHandler(BaseHTTPRequestHandler):
+        server_version = "anki-search"
+
+        def log_message(self, format, *log_args):
+            pass  # One line per GoldenDict lookup would flood the console.
+
+        def _send(self, status: int, body: str, content_type: str = "text/plain", etag: str | None = None):
+            data = body.encode("utf-8")
+            self.send_response(status)
+            if etag:
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", "no-cache")  # Revalidate with If-None-Match every time.
+            if status != 304:
+                self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            if status != 304:
+                self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path != "/lookup":
+                self._send(404, "Not found. Use /lookup?word=...\n")
+                return
+            params = parse_qs(url.query)
+            word = params.get("word", [""])[0].strip()
+            search_type = params.get("type", [args.search_type])[0]
+            output_format = params.get("format", [args.format])[0]
+            if not word or search_type not in ("word", "sentence", "all", "lemma") or output_format not in OUTPUT_FORMATS \
+                    or not SCHEMA.supports(search_type):
+                self._send(400, "Expected /lookup?word=...[&type=word|sentence|all|lemma][&format=plain|html|json|ndjson]\n")
+                return
+            request_args = argparse.Namespace(**{**vars(args), "query": word, "search_type": search_type,
+                                                 "format": output_format, "html": output_format == "html"})
+
+            key = _cache_key(request_args)
+            try:
+                fingerprint = _lookup_fingerprint(request_args)
+            except sqlite3.Error:
+                fingerprint = None
+            etag = None
+            if fingerprint is not None:
+                etag = '"' + hashlib.sha1(f"{fingerprint}\0{key}".encode("utf-8")).hexdigest()[:24] + '"'
+                if_none_match = [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]
+                if etag in if_none_match or "*" in if_none_match:
+                    self._send(304, "", etag=etag)
+                    return
+
+            body = cache_lookup(key, args.cache_check_interval) if cacheable else None
+            if body is None:
+                try:
+                    body = lookup(request_args)
+                except AnkiConnectError as e:
+                    self._send(503, f"Error connecting to AnkiConnect: {e}\n")
+                    return
+                except (sqlite3.Error, OSError) as e:
+                    self._send(503, f"Error reading the Anki collection: {e}\n")
+                    return
+                if body is None:
+                    self._send(503, LEMMA_NEEDS_MIRROR + "\n")
+                    return
+                if cacheable:
+                    cache_store(key, body, args.cache_entries, args.cache_size, args.cache_check_interval)
+            if output_format == "html":
+                body = (f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>{html.escape(word)}</title></head>\n'
+                        f'<body>\n{body or "<p>No matches.</p>"}\n</body></html>\n')
+            self._send(200, body, content_types[output_format], etag)
+
+    with _PooledHTTPServer((args.http_host, args.http_port), LookupHandler, max(1, args.http_workers)) as server:
+        print(f"Serving lookups on http://{args.http_host}:{server.server_address[1]}/lookup?word=%GDWORD%")
+        sys.stdout.flush()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+def build_parser() -> argparse.ArgumentParser:
+    """Builds the command-line argument parser."""
     parser = argparse.ArgumentParser(description="Search for a word in Anki decks or open a query in the Anki Browser.")
     
     # Group arguments for clarity: one for searching, one for opening the browser.
     search_group = parser.add_argument_group('Search arguments')
     search_group.add_argument("--query", help="Word to search for in any Anki deck (e.g., --query \"test\")")
-    search_group.add_argument("--search-type", choices=['word', 'sentence'], default='word',
-                        help="Type of search: 'word' for WordSource, 'sentence' for SentenceSource (default: word)")
+    search_group.add_argument("--search-type", choices=['word', 'sentence', 'all', 'lemma'], default='word',
+                        help="Type of search: 'word' for WordSource, 'sentence' for SentenceSource, "
+                             "'all' for both at once, grouped by match type, 'lemma' for the exact word form "
+                             "in the local mirror's lemma index, ignoring case, umlaut and ß spelling (default: word)")
     search_group.add_argument("--html", action="store_true", help="Output search results in HTML format.")
+    search_group.add_argument("--format", choices=OUTPUT_FORMATS,
+                        help="Output format: 'plain', 'html', 'json' (one array) or 'ndjson' (one card per line, "
+                             "streamed). Default: 'html' with --html, otherwise 'plain'. With --html, JSON keeps "
+                             "the HTML tags of the fields.")
+    search_group.add_argument("--retrieval", choices=['cards', 'notes'], default='cards',
+                        help="Fetch every matching card with cardsInfo, or each matching note once with notesInfo (default: cards).")
+    search_group.add_argument("--compare-retrieval", action="store_true",
+                        help="With --query, report requests, response bytes and wall time of both retrieval modes instead of the results.")
+    search_group.add_argument("--limit", type=int, metavar="N",
+                        help="Print at most N results; retrieval stops as soon as they are fetched.")
+    search_group.add_argument("--rank", action="store_true",
+                        help="Order results by match quality: exact WordSource, inflected form, whole word, "
+                             "then partial match, newer notes first within each.")
+    search_group.add_argument("--top", type=int, metavar="K",
+                        help="Rank the results and print only the best K (implies --rank).")
+    search_group.add_argument("--schema", default=SCHEMA_PATH, metavar="PATH",
+                        help="JSON file with the note types, fields and search modes (default: ~/.anki-search/schema.json "
+                             "if it exists, otherwise the built-in note type).")
+    search_group.add_argument("--clean-processes", type=int, default=0, metavar="N",
+                        help="Strip the HTML of very large result sets in N worker processes (default: 0, in this process).")
+    search_group.add_argument("--page-size", type=int, default=PAGE_SIZE,
+                        help=f"Number of cards or notes fetched per request while streaming results (default: {PAGE_SIZE}).")
+    search_group.add_argument("--query-file", metavar="PATH",
+                        help="Search for every term in a file, one per line ('-' reads from stdin).")
+    search_group.add_argument("--batch-size", type=int, default=50,
+                        help="Number of terms sent to AnkiConnect per 'multi' request with --query-file (default: 50).")
 
     browse_group = parser.add_argument_group('Browser arguments')
     browse_group.add_argument("--browse-query", help="A query to open directly in the Anki Browser (e.g., --browse-query \"deck:MyDeck\")")
     browse_group.add_argument("--browse-clipboard", action="store_true", help="Use the content of the clipboard as the query to open in the Anki Browser.")
+    browse_group.add_argument("--watch-clipboard", action="store_true",
+                        help="Keep running and open every newly copied text in the Anki Browser.")
+    browse_group.add_argument("--no-wait", action="store_true",
+                        help="With --browse-query or --browse-clipboard, hand the query to a background worker and "
+                             f"exit at once; the outcome is logged to {BROWSE_LOG_PATH}.")
+    browse_group.add_argument("--debounce", type=float, metavar="SECONDS",
+                        help="Seconds without a newer query before one is sent: the clipboard with --watch-clipboard "
+                             f"(default: {WATCH_DEBOUNCE}), queued queries with --no-wait (default: {BROWSE_DEBOUNCE}).")
+    browse_group.add_argument("--browse-worker", action="store_true", help=argparse.SUPPRESS)
+
+    backend_group = parser.add_argument_group('Backend arguments')
+    backend_group.add_argument("--backend", choices=['ankiconnect', 'direct'], default='ankiconnect',
+                        help="Search through AnkiConnect, or read the collection file directly, which also works while Anki is closed (default: ankiconnect).")
+    backend_group.add_argument("--collection", type=os.path.expanduser, default=COLLECTION_PATH, metavar="PATH",
+                        help=f"collection.anki2 read by --backend direct (default: {COLLECTION_PATH}, or the ANKI_COLLECTION environment variable).")
+    backend_group.add_argument("--snapshot", action="store_true",
+                        help="With --backend direct, read a copy of the collection instead of the file Anki is using.")
+
+    mirror_group = parser.add_argument_group('Mirror arguments')
+    mirror_group.add_argument("--sync", action="store_true", help=f"Update the local mirror of the searched note fields ({MIRROR_PATH}) from Anki.")
+    mirror_group.add_argument("--full-sync", action="store_true", help="Re-download every note into the local mirror instead of only edited ones.")
+    mirror_group.add_argument("--max-staleness", type=float, default=300, metavar="SECONDS",
+                        help="Sync the mirror before a --query if it is older than this (default: 300).")
+    mirror_group.add_argument("--no-mirror", action="store_true", help="Always query Anki directly, even if a local mirror exists.")
+
+    cache_group = parser.add_argument_group('Cache arguments')
+    cache_group.add_argument("--no-cache", action="store_true", help=f"Do not read or write the result cache ({CACHE_PATH}).")
+    cache_group.add_argument("--cache-entries", type=int, default=CACHE_MAX_ENTRIES,
+                        help=f"Maximum number of cached --query outputs (default: {CACHE_MAX_ENTRIES}).")
+    cache_group.add_argument("--cache-size", type=int, default=CACHE_MAX_BYTES, metavar="BYTES",
+                        help=f"Maximum total size of the cached outputs (default: {CACHE_MAX_BYTES}).")
+    cache_group.add_argument("--prefetch", metavar="PATH",
+                        help="Look up every word of a text file ('-' reads from stdin) and store the output of "
+                             "--query for each in the result cache. With --no-wait, run in the background.")
+    cache_group.add_argument("--prefetch-clipboard", action="store_true",
+                        help="Like --prefetch, for the text on the clipboard (e.g. the paragraph being read).")
+    cache_group.add_argument("--cache-stats", action="store_true",
+                        help="Print the hit rate of the result cache and the cost of prefetching.")
+    cache_group.add_argument("--cache-check-interval", type=float, default=CACHE_CHECK_INTERVAL, metavar="SECONDS",
+                        help=f"How long a cache hit is served without checking Anki for changes (default: {CACHE_CHECK_INTERVAL}).")
 
-    args = parser.parse_args()
+    connection_group = parser.add_argument_group('Connection arguments')
+    connection_group.add_argument("--anki-url", default=ANKI_CONNECT_URL,
+                        help=f"AnkiConnect address (default: {ANKI_CONNECT_URL}, or the ANKI_CONNECT_URL environment variable).")
+    connection_group.add_argument("--connect-timeout", type=float, default=CONNECT_TIMEOUT, metavar="SECONDS",
+                        help=f"Timeout for connecting to AnkiConnect (default: {CONNECT_TIMEOUT}).")
+    connection_group.add_argument("--read-timeout", type=float, default=READ_TIMEOUT, metavar="SECONDS",
+                        help=f"Timeout for AnkiConnect to answer (default: {READ_TIMEOUT}).")
+    connection_group.add_argument("--retries", type=int, default=RETRIES,
+                        help=f"Number of retries when connecting to AnkiConnect fails (default: {RETRIES}).")
+    connection_group.add_argument("--transport", choices=TRANSPORTS,
+                        help="HTTP client used for AnkiConnect: 'requests', 'stdlib' (http.client) or 'auto' "
+                             "(default: 'stdlib' for the browse options, which send a single request; otherwise 'auto', "
+                             "which uses requests if it is installed).")
 
+    timing_group = parser.add_argument_group('Timing arguments')
+    timing_group.add_argument("--profile", action="store_true",
+                        help="Print a breakdown of where the time went (start-up, imports, clipboard, AnkiConnect actions, rendering) to stderr.")
+    timing_group.add_argument("--timing-log", metavar="PATH",
+                        help="Append the timing breakdown of this invocation as a JSON line to PATH.")
+    timing_group.add_argument("--timing-summary", metavar="PATH",
+                        help="Print percentile summaries of a timing log written with --timing-log and exit.")
+
+    daemon_group = parser.add_argument_group('Daemon arguments')
+    daemon_group.add_argument("--serve", action="store_true", help=f"Run as a resident daemon listening on {DAEMON_ADDRESS} (use anki-search-client.py to talk to it).")
+    daemon_group.add_argument("--http-server", action="store_true",
+                        help="Serve lookups at http://HOST:PORT/lookup?word=... for GoldenDict's 'Websites' dictionaries.")
+    daemon_group.add_argument("--http-host", default=HTTP_HOST, help=f"Address the HTTP server listens on (default: {HTTP_HOST}).")
+    daemon_group.add_argument("--http-port", type=int, default=HTTP_PORT, help=f"Port of the HTTP server (default: {HTTP_PORT}).")
+    daemon_group.add_argument("--http-workers", type=int, default=WORKERS,
+                        help=f"Number of lookups the HTTP server handles at the same time (default: {WORKERS}).")
+
+    return parser
+
+def _configure_client(args: argparse.Namespace):
+    """Applies the connection arguments to the shared client, keeping its session (and open connections)."""
+    ANKI_CLIENT.url = args.anki_url
+    ANKI_CLIENT.connect_timeout = args.connect_timeout
+    ANKI_CLIENT.read_timeout = args.read_timeout
+    ANKI_CLIENT.retries = max(0, args.retries)
+    ANKI_CLIENT.transport = args.transport
+
+def _configure_schema(args: argparse.Namespace):
+    """Loads the schema of --schema, unless it is the one already in use (e.g. in the daemon)."""
+    global SCHEMA, _SCHEMA_SOURCE
+    try:
+        stat = os.stat(args.schema)
+        source = (args.schema, stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        if args.schema != SCHEMA_PATH:
+            raise  # Only the default location may be missing.
+        source = None
+    if source != _SCHEMA_SOURCE:
+        SCHEMA = load_schema(args.schema)
+        _SCHEMA_SOURCE = source
+
+_SCHEMA_SOURCE = None
+
+def _mirror_ready(args: argparse.Namespace) -> bool:
+    """
+    Decides whether searches should be answered from the local mirror.
+
+    Syncs the mirror first if it is older than --max-staleness; if Anki is not
+    reachable, the stale mirror is used anyway.
+    """
+    age = None if args.no_mirror else mirror_age()
+    if age is None:
+        return False
+    if age > args.max_staleness:
+        with _SYNC_LOCK:
+            if (mirror_age() or 0) <= args.max_staleness:
+                return True  # Another lookup synced the mirror while this one waited.
+            try:
+                sync_mirror()
+            except AnkiConnectError as e:
+                print(f"Warning: could not sync the local mirror: {e}", file=sys.stderr)
+    return True
+
+def _find(args: argparse.Namespace):
+    """
+    Runs the single search of --query on the selected backend.
+
+    Returns:
+        The results (a list, or a generator that fetches pages while it is consumed),
+        or None for a lemma search without a local mirror.
+
+    Raises:
+        AnkiConnectError: If AnkiConnect cannot be reached.
+        sqlite3.Error, OSError: If the collection cannot be read.
+    """
+    if args.backend == "direct" and args.search_type != "lemma":
+        return search_collection(args.query, args.search_type, html_output=args.html, path=args.collection,
+                                 retrieval=args.retrieval, limit=args.limit, snapshot=args.snapshot,
+                                 rank=args.rank, top=args.top) or []
+    if _mirror_ready(args):
+        return search_mirror(args.query, args.search_type, html_output=args.html, limit=args.limit,
+                             rank=args.rank, top=args.top) or []
+    if args.search_type == "lemma":
+        return None
+    return itertools.islice(
+        iter_search_results(args.query, args.search_type, html_output=args.html,
+                            retrieval=args.retrieval, page_size=args.page_size, rank=args.rank, top=args.top),
+        args.limit)
+
+def _find_groups(args: argparse.Namespace) -> dict[str, list[Card]]:
+    """Runs the searches of --search-type all on the selected backend; raises like _find()."""
+    if args.backend == "direct":
+        return {match_type: search_collection(args.query, match_type, html_output=args.html, path=args.collection,
+                                              retrieval=args.retrieval, limit=args.limit, snapshot=args.snapshot,
+                                              rank=args.rank, top=args.top) or []
+                for match_type in SCHEMA.match_types}
+    if _mirror_ready(args):
+        return {match_type: search_mirror(args.query, match_type, html_output=args.html, limit=args.limit,
+                                          rank=args.rank, top=args.top) or []
+                for match_type in SCHEMA.match_types}
+    return search_all(args.query, html_output=args.html, retrieval=args.retrieval,
+                      page_size=args.page_size, limit=args.limit, rank=args.rank, top=args.top)
+
+def render_groups(groups: dict[str, list[Card]], output_format: str) -> str:
+    """Renders the results of --search-type all, with a heading per match type (or one JSON object)."""
+    if output_format == "json":
+        return json.dumps({match_type: [card.as_dict() for card in result] for match_type, result in groups.items()},
+                          ensure_ascii=False) + "\n"
+    if output_format == "ndjson":
+        return "".join(render_cards(result, "ndjson", extra={"match_type": match_type})
+                       for match_type, result in groups.items())
+    parts = []
+    for match_type, result in groups.items():
+        if not result:
+            continue
+        # Each match type gets a heading; groups are separated like cards.
+        heading = f"{match_type.capitalize()} matches"
+        if output_format == "html":
+            parts.append(f"{'<br><br>' if parts else ''}<h3>{heading}</h3>\n")
+        else:
+            parts.append(f"{chr(10) if parts else ''}=== {heading} ===\n")
+        parts.append(render_cards(result, output_format))
+    return "".join(parts)
+
+def _run_query(args: argparse.Namespace) -> int:
+    """Runs --query: searches for one term and prints the results."""
+    import sqlite3
+    if args.search_type == "all":
+        return _run_query_all(args)
+    try:
+        result = _find(args)
+        if result is None:
+            print(LEMMA_NEEDS_MIRROR)
+            return 1
+        print_results(result, args.format)
+    except AnkiConnectError as e:
+        print(f"Error connecting to AnkiConnect: {e}")
+        return 1
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error reading the Anki collection: {e}")
+        return 1
+    return 0
+
+def _run_query_all(args: argparse.Namespace) -> int:
+    """Runs --query with --search-type all and prints the results grouped by match type."""
+    import sqlite3
+    try:
+        groups = _find_groups(args)
+    except AnkiConnectError as e:
+        print(f"Error connecting to AnkiConnect: {e}")
+        return 1
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error reading the Anki collection: {e}")
+        return 1
+    if args.format == "ndjson":
+        for match_type, result in groups.items():
+            print_results(result, "ndjson", extra={"match_type": match_type})
+        return 0
+    with PROFILER.span("render"):
+        sys.stdout.write(render_groups(groups, args.format))
+    return 0
+
+def _run_batch(args: argparse.Namespace) -> int:
+    """Runs --query-file: looks up every listed term and prints the results in input order."""
+    import html
+    import sqlite3
+    if args.query_file == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(args.query_file, encoding="utf-8") as handle:
+            lines = handle.read().splitlines()
+    terms = [line.strip() for line in lines if line.strip()]
+
+    if args.backend == "direct" and args.search_type != "lemma":
+        results = ((term, search_collection(term, args.search_type, html_output=args.html, path=args.collection,
+                                            retrieval=args.retrieval, snapshot=args.snapshot, rank=args.rank, top=args.top))
+                   for term in terms)
+    elif _mirror_ready(args):
+        results = ((term, search_mirror(term, args.search_type, html_output=args.html, rank=args.rank, top=args.top))
+                   for term in terms)
+    elif args.search_type == "lemma":
+        print(LEMMA_NEEDS_MIRROR)
+        return 1
+    else:
+        results = search_words_batch(terms, args.search_type, html_output=args.html,
+                                     batch_size=max(1, args.batch_size), retrieval=args.retrieval,
+                                     rank=args.rank, top=args.top, page_size=args.page_size)
+    entries = []  # --format json collects all terms into one document.
+    try:
+        for i, (term, result) in enumerate(results):
+            if args.format == "ndjson":
+                print_results(result or [], "ndjson", extra={"query": term})
+                continue
+            if args.format == "json":
+                entries.append({"query": term, "results": [card.as_dict() for card in result or []]})
+                continue
+            # Each term gets a heading; consecutive terms are separated like cards.
+            with PROFILER.span("render"):
+                if args.format == "html":
+                    separator = "<br><br>" if i else ""
+                    block = f"{separator}<h3>{html.escape(term)}</h3>\n"
+                else:
+                    separator = "\n" if i else ""
+                    block = f"{separator}=== {term} ===\n"
+                sys.stdout.write(block + render_cards(result or [], args.format))
+            sys.stdout.flush()  # Stream each term's results as soon as they are ready.
+    except AnkiConnectError as e:
+        print(f"Error connecting to AnkiConnect: {e}")
+        return 1
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error reading the Anki collection: {e}")
+        return 1
+    if args.format == "json":
+        sys.stdout.write(json.dumps(entries, ensure_ascii=False) + "\n")
+    return 0
+
+def _run_prefetch(args: argparse.Namespace) -> int:
+    """Runs --prefetch and --prefetch-clipboard."""
+    if args.no_cache or args.backend == "direct":
+        print("Error: --prefetch fills the result cache, which is not used with --no-cache or --backend direct.")
+        return 1
+    if args.no_wait:
+        # The background process cannot read our standard input, so it is handed over.
+        text = sys.stdin.read() if args.prefetch == "-" else None
+        _spawn_detached([argument for argument in args.argv if argument != "--no-wait"], stdin_text=text)
+        print("Prefetching in the background.")
+        return 0
+    if args.prefetch_clipboard:
+        with PROFILER.span("clipboard"):
+            text = _lazy_import("pyperclip").paste() or ""
+    elif args.prefetch == "-":
+        text = sys.stdin.read()
+    else:
+        with open(args.prefetch, encoding="utf-8") as handle:
+            text = handle.read()
+    words = prefetch_words(text, max(1, min(PREFETCH_MAX_WORDS, int(args.cache_entries * PREFETCH_CACHE_SHARE))))
+    try:
+        counts = prefetch(words, args)
+    except AnkiConnectError as e:
+        print(f"Error connecting to AnkiConnect: {e}")
+        return 1
+    if counts is None:
+        print(LEMMA_NEEDS_MIRROR)
+        return 1
+    looked_up, stored = counts
+    print(f"Prefetched {looked_up} of {len(words)} words ({len(words) - looked_up} already cached), "
+          f"{stored} cache entries stored.")
+    return 0
+
+def main(argv: list[str] | None = None, forwarded: bool = False) -> int:
+    """
+    Entry point shared by the command line and the daemon.
+
+    Args:
+        argv (list[str] | None): Command-line arguments; defaults to sys.argv[1:].
+        forwarded (bool): True if the daemon runs the arguments for a client; modes
+            that keep running are refused, as they would block the daemon.
+
+    Returns:
+        The process exit status.
+    """
+    PROFILER.reset()
+    while _STARTUP_SPANS:  # Only the first invocation of the process paid for these.
+        PROFILER.add(*_STARTUP_SPANS.popitem())
+
+    with PROFILER.span("argparse"):
+        parser = build_parser()
+        args = parser.parse_args(argv)
+    args.argv = list(sys.argv[1:] if argv is None else argv)
+    if args.search_type == "all" and (args.query_file or args.compare_retrieval or args.prefetch or args.prefetch_clipboard):
+        parser.error("--search-type all cannot be combined with --query-file, --compare-retrieval or --prefetch.")
+    if args.search_type == "lemma" and args.compare_retrieval:
+        parser.error("--search-type lemma cannot be combined with --compare-retrieval.")
+    if (args.limit is not None and args.limit < 0) or (args.top is not None and args.top < 0):
+        parser.error("--limit and --top must not be negative.")
+    if forwarded and (args.serve or args.http_server or args.watch_clipboard or args.browse_worker):
+        print("Error: --serve, --http-server, --watch-clipboard and --browse-worker keep running and cannot be "
+              "forwarded to the daemon; start them with anki-search.py.")
+        return 2
+    if args.transport is None:
+        args.transport = "stdlib" if args.browse_query or args.browse_clipboard or args.browse_worker else "auto"
+    if args.format is None:
+        args.format = "html" if args.html or args.http_server else "plain"
+    if args.format == "html":
+        args.html = True
+    if args.top is not None:
+        args.rank = True
+    if args.rank and args.limit is not None:
+        # Ranking has to see every candidate, so --limit bounds the ranked list like --top.
+        args.top = min(args.limit, args.top if args.top is not None else args.limit)
+        args.limit = None
+    if args.timing_summary:
+        return print_timing_summary(args.timing_summary)
+    _configure_client(args)
+    FIELD_CLEANER.processes = args.clean_processes
+    try:
+        _configure_schema(args)
+    except (OSError, ValueError) as e:
+        print(f"Error reading schema {args.schema}: {e}")
+        return 1
+    if (args.query or args.query_file or args.prefetch or args.prefetch_clipboard) and not SCHEMA.supports(args.search_type):
+        print(f"Error: the schema {args.schema} disables the '{args.search_type}' search mode.")
+        return 1
+
+    status = _dispatch(args, parser)
+
+    if args.profile:
+        print(PROFILER.report(), file=sys.stderr)
+    if args.timing_log:
+        _append_timing_log(args.timing_log, _mode_name(args), status)
+    return status
+
+def _mode_name(args: argparse.Namespace) -> str:
+    """Names the action of an invocation for the timing log."""
+    if args.serve:
+        return "serve"
+    if args.sync or args.full_sync:
+        return "sync"
+    if args.watch_clipboard:
+        return "watch-clipboard"
+    if args.browse_worker:
+        return "browse-worker"
+    if args.browse_clipboard:
+        return "browse-clipboard"
+    if args.browse_query:
+        return "browse-query"
+    if args.query:
+        return f"query:{args.search_type}"
+    if args.query_file:
+        return "query-file"
+    if args.prefetch or args.prefetch_clipboard:
+        return "prefetch"
+    if args.cache_stats:
+        return "cache-stats"
+    return "help"
+
+def _append_timing_log(path: str, mode: str, status: int):
+    """Appends the current profile as one JSON line to the timing log."""
+    entry = {"time": time.time(), "mode": mode, "status": status, **PROFILER.record()}
+    try:
+        with open(path, "a", encoding="utf-8") as handle:
+            handle.write(json.dumps(entry) + "\n")
+    except OSError as e:
+        print(f"Error writing the timing log: {e}", file=sys.stderr)
+
+def print_timing_summary(path: str) -> int:
+    """
+    Prints p50/p95/max of every span per mode across the invocations in a timing log.
+
+    Args:
+        path (str): A JSON lines file written with --timing-log.
+    """
+    samples = {}  # mode -> span -> list of milliseconds
+    try:
+        with open(path, encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Skip lines cut off by a crash.
+                spans = samples.setdefault(entry.get("mode", "?"), {})
+                spans.setdefault("total", []).append(entry.get("total_ms", 0.0))
+                for name, milliseconds in entry.get("spans", {}).items():
+                    spans.setdefault(name, []).append(milliseconds)
+    except OSError as e:
+        print(f"Error reading the timing log: {e}")
+        return 1
+
+    def percentile(values: list[float], fraction: float) -> float:
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+    import statistics
+    for mode, spans in sorted(samples.items()):
+        print(f"{mode} ({len(spans['total'])} runs)")
+        print(f"  {'span':<24} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'runs':>5}")
+        for name, values in sorted(spans.items(), key=lambda item: -statistics.median(item[1])):
+            print(f"  {name:<24} {percentile(values, 0.5):>9.1f} {percentile(values, 0.95):>9.1f} "
+                  f"{max(values):>9.1f} {len(values):>5}")
+    return 0
+
+def _dispatch(args: argparse.Namespace, parser: argparse.ArgumentParser) -> int:
+    """Runs the action selected by the command-line arguments and returns the exit status."""
     # Determine which action to take based on the provided arguments.
+    # Priority 0: Run as a resident daemon.
+    if args.serve:
+        serve()
+    # Priority 0.25: Serve lookups over HTTP.
+    elif args.http_server:
+        serve_http(args)
+    # Priority 0.5: Update the local mirror.
+    elif args.sync or args.full_sync:
+        try:
+            updated, deleted = sync_mirror(full=args.full_sync)
+        except AnkiConnectError as e:
+            print(f"Error syncing the local mirror: {e}")
+            return 1
+        print(f"Mirror synced: {updated} notes updated, {deleted} removed.")
+    # Priority 0.75: Keep watching the clipboard.
+    elif args.watch_clipboard:
+        watch_clipboard(debounce=args.debounce if args.debounce is not None else WATCH_DEBOUNCE)
+    # Priority 0.8: Background worker started by --no-wait.
+    elif args.browse_worker:
+        run_browse_worker(debounce=args.debounce if args.debounce is not None else BROWSE_DEBOUNCE)
     # Priority 1: If --browse-clipboard is used, search with clipboard content.
-    if args.browse_clipboard:
-        clipboard_content = pyperclip.paste()
-        if clipboard_content:
+    elif args.browse_clipboard:
+        with PROFILER.span("clipboard"):
+            clipboard_content = _lazy_import("pyperclip").paste()
+        if clipboard_content and args.no_wait:
+            queue_browse(clipboard_content.strip(), args)
+        elif clipboard_content:
             open_in_anki_browser(clipboard_content.strip())
         else:
             print("Clipboard is empty.")
     # Priority 2: If a direct browse query is given.
+    elif args.browse_query and args.no_wait:
+        queue_browse(args.browse_query, args)
     elif args.browse_query:
         open_in_anki_browser(args.browse_query)
     # Priority 3: If a search query is given, perform the search and print results.
+    elif args.query and args.compare_retrieval:
+        print(f"{'mode':<6} {'requests':>8} {'bytes':>10} {'results':>7} {'ms':>9}")
+        for mode, request_count, byte_count, result_count, elapsed in compare_retrieval(args.query, args.search_type):
+            print(f"{mode:<6} {request_count:>8} {byte_count:>10} {result_count:>7} {elapsed * 1000:>9.1f}")
     elif args.query:
-        result = search_word_in_decks(args.query, args.search_type, html_output=args.html)
-        if result:
-            # Format and print the results based on whether HTML output is requested.
-            if args.html:
-                for i, card in enumerate(result):
-                    lines = []
-                    if card['WordSource']:
-                        line = f"{card['WordSource']}"
-                        if card['WordDestination']:
-                            line += f" - {card['WordDestination']}"
-                        lines.append(line)
-                    # Add other fields if they exist
-                    if card['WordSourceIPA']: lines.append(f"[{card['WordSourceIPA']}]")
-                    if card['WordSourceInflectedForm']: lines.append(f"{card['WordSourceInflectedForm']}")
-                    if card['SentenceSource']: lines.append(f"{card['SentenceSource']}")
-                    if card['SentenceDestination']: lines.append(f"- {card['SentenceDestination']}")
-                    if card['SentenceDestination2']: lines.append(f"- {card['SentenceDestination2']}")
-                    if card['WordSourceMorphologyAI']: lines.append(f"{card['WordSourceMorphologyAI']}")
-                    if card['DeckName']: lines.append(f"deck:{card['DeckName']}")
-
-                    print("<br>\n".join(lines))
-
-                    # Add a separator between cards.
-                    if i < len(result) - 1:
-                        print("<br><br>")
-            else: # Plain text output
-                for i, card in enumerate(result):
-                    if card['WordSource']:
-                        print(f"{card['WordSource']}", end='')
-                        if card['WordDestination']:
-                            print(f" — {card['WordDestination']}")
-                        else:
-                            print("")
-                    if card['WordSourceIPA']: print(f"[{card['WordSourceIPA']}]")
-                    if card['WordSourceInflectedForm']: print(f"{card['WordSourceInflectedForm']}")
-                    if card['SentenceSource']: print(f"{card['SentenceSource']}")
-                    if card['SentenceDestination']: print(f"- {card['SentenceDestination']}")
-                    if card['SentenceDestination2']: print(f"- {card['SentenceDestination2']}")
-                    if card['WordSourceMorphologyAI']: print(f"{card['WordSourceMorphologyAI']}")
-                    if card['DeckName']: print(f"deck:{card['DeckName']}")
-                    
-                    # Add a separator between cards.
-                    if i != len(result) - 1:
-                        print("\t")
+        if args.no_cache or args.backend == "direct":
+            return _run_query(args)  # The direct backend reads a local file and needs no cache.
+        key = _cache_key(args)
+        with PROFILER.span("cache:lookup"):
+            cached = cache_lookup(key, args.cache_check_interval)
+        if cached is not None:
+            sys.stdout.write(cached)
+            return 0
+        tee = _Tee(sys.stdout)
+        with contextlib.redirect_stdout(tee):
+            status = _run_query(args)
+        if status == 0:
+            with PROFILER.span("cache:store"):
+                cache_store(key, tee.copy.getvalue(), args.cache_entries, args.cache_size, args.cache_check_interval)
+        return status
+    # Priority 4: Search for every term of a word list.
+    elif args.query_file:
+        return _run_batch(args)
+    # Priority 5: Warm the result cache for a text that is being read.
+    elif args.prefetch or args.prefetch_clipboard:
+        return _run_prefetch(args)
+    elif args.cache_stats:
+        return print_cache_stats()
     # If no valid arguments are provided, show the help message.
     else:
-        parser.print_help()
\ No newline at end of file
+        parser.print_help()
+    return 0
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    sys.exit(main())